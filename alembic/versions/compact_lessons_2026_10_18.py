@@ -0,0 +1,75 @@
+"""compact lessons
+
+Revision ID: 1deeb436250b
+Revises: 111431481b54
+Create Date: 2026-10-18 13:02:17.540912
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1deeb436250b"
+down_revision: Union[str, None] = "111431481b54"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Нд")
+
+
+def upgrade() -> None:
+    # Day of the week: "Пн".."Нд" -> 0..6
+    day_to_num = " ".join(f"WHEN '{day}' THEN {num}" for num, day in enumerate(DAYS))
+    op.alter_column(
+        "lessons",
+        "dow",
+        type_=sa.SmallInteger(),
+        postgresql_using=f"CASE dow {day_to_num} END",
+    )
+    # Only time of begin/end is meaningful
+    op.alter_column("lessons", "begin", type_=sa.Time(), postgresql_using="begin::time")
+    op.alter_column("lessons", "end", type_=sa.Time(), postgresql_using='"end"::time')
+    # Random UUID key -> sequential bigint identity (filled for existing rows)
+    op.drop_column("lessons", "id")
+    op.add_column(
+        "lessons",
+        sa.Column("id", sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    )
+    op.create_primary_key("lessons_pkey", "lessons", ["id"])
+    op.execute("ANALYZE lessons")
+
+
+def downgrade() -> None:
+    op.drop_column("lessons", "id")
+    op.add_column(
+        "lessons",
+        sa.Column(
+            "id", sa.UUID(), server_default=sa.text("gen_random_uuid()"), nullable=False
+        ),
+    )
+    op.alter_column("lessons", "id", server_default=None)
+    op.create_primary_key("lessons_pkey", "lessons", ["id"])
+    # Date part is lost, so times are put on the epoch date
+    op.alter_column(
+        "lessons",
+        "end",
+        type_=sa.DateTime(),
+        postgresql_using="DATE '1970-01-01' + \"end\"",
+    )
+    op.alter_column(
+        "lessons",
+        "begin",
+        type_=sa.DateTime(),
+        postgresql_using="DATE '1970-01-01' + begin",
+    )
+    num_to_day = " ".join(f"WHEN {num} THEN '{day}'" for num, day in enumerate(DAYS))
+    op.alter_column(
+        "lessons",
+        "dow",
+        type_=sa.String(),
+        postgresql_using=f"CASE dow {num_to_day} END",
+    )
@@ -0,0 +1,596 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import ujson
+from fastapi import Request, Response
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import LockError
+
+from app.redis_session import listen_channel
+from config_reader import Cache as CacheConfig
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # brotli is optional, responses are only gzipped without it
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+# Content encodings of precompressed bodies, in order of preference
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+FACULTIES_KEY = "cache:faculties"
+# Compression levels: the best ones for fills in background (sync, warm-up),
+# fast ones for fills on request paths, where compression adds to the latency
+GZIP_LEVEL, GZIP_FAST_LEVEL = 9, 6
+BROTLI_QUALITY, BROTLI_FAST_QUALITY = 11, 5
+INVALIDATION_CHANNEL = "cache_invalidate"
+
+settings: CacheConfig = CacheConfig()
+
+
+def group_key(group_id: int) -> str:
+    """Redis key of the group timetable."""
+    return f"cache:group:{group_id}"
+
+
+def teacher_key(teacher_id: int) -> str:
+    """Redis key of the teacher timetable."""
+    return f"cache:teacher:{teacher_id}"
+
+
+def room_key(room: str) -> str:
+    """Redis key of the room timetable."""
+    return f"cache:room:{room}"
+
+
+def encode_json(obj: Any) -> bytes:
+    """Serialize object to json bytes (same output format as FastAPI)."""
+    # ujson escapes "/" by default, json (used by FastAPI) doesn't
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode(
+        "utf-8"
+    )
+
+
+def wrap_data(data: bytes, cached: bool) -> bytes:
+    """Wrap already serialized data into {"cached": ..., "data": ...} envelope."""
+    prefix = b'{"cached":true,"data":' if cached else b'{"cached":false,"data":'
+    return prefix + data + b"}"
+
+
+def unwrap_data(body: bytes) -> bytes:
+    """Get serialized data back from the envelope made by wrap_data."""
+    return body[body.index(b'"data":') + len(b'"data":') : -1]
+
+
+def json_response(body: bytes) -> Response:
+    """Make response from already serialized json body."""
+    return Response(content=body, media_type=JSON_MEDIA_TYPE)
+
+
+def body_hash(body: bytes) -> str:
+    """Content hash of the response body (used as ETag)."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def compress(
+    body: bytes, fast: bool = False, encodings: Iterable[str] = ENCODINGS
+) -> Dict[str, bytes]:
+    """
+    Compress response body with supported content encodings.
+    It's done once per cache fill, so the best compression level is used,
+    unless it's done on request path.
+    :param body: response body
+    :param fast: whether to use fast compression levels
+    :param encodings: content encodings (all of ENCODINGS by default)
+    :return: {encoding: compressed body}
+    """
+    encoded: Dict[str, bytes] = {}
+    for encoding in encodings:
+        if encoding == "br":
+            encoded[encoding] = brotli.compress(
+                body, quality=BROTLI_FAST_QUALITY if fast else BROTLI_QUALITY
+            )
+        else:
+            encoded[encoding] = gzip.compress(
+                body, compresslevel=GZIP_FAST_LEVEL if fast else GZIP_LEVEL, mtime=0
+            )
+    return encoded
+
+
+class CacheEntry:
+    """
+    Cached response. Body is the final response body (with "cached": true envelope).
+    After fresh_until entry is stale, but still can be served while it's refreshed.
+    Etag is the body hash and modified is the time the body was built.
+    Encoded are compressed variants of the rendered body, valid while the render
+    output doesn't change (i.e. for the same variant, see cached_response).
+    Derived is a structure built from the body on demand (e.g. timetable slices),
+    it lives as long as the entry itself, so it's rebuilt once per cache fill.
+    """
+
+    __slots__ = (
+        "body",
+        "fresh_until",
+        "etag",
+        "modified",
+        "variant",
+        "encoded",
+        "derived",
+    )
+
+    # Arguments are fields of the redis hash (see to_mapping)
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        body: bytes,
+        fresh_until: float,
+        etag: str | None = None,
+        modified: float | None = None,
+        variant: str | None = None,
+        encoded: Dict[str, bytes] | None = None,
+    ) -> None:
+        self.body = body
+        self.fresh_until = fresh_until
+        self.etag = etag or body_hash(body)
+        self.modified = time.time() if modified is None else modified
+        self.variant = variant
+        self.encoded: Dict[str, bytes] = encoded or {}
+        self.derived: Any = None
+
+    def precompress(
+        self,
+        render: Callable[[bytes], bytes] | None = None,
+        variant: str = "",
+        fast: bool = False,
+    ) -> None:
+        """
+        Build compressed variants of the rendered body.
+        :param render: function applied to the body before it's sent
+        :param variant: identifies render output (e.g. current weeks dates)
+        :param fast: whether to use fast compression levels (on request path)
+        """
+        self.encoded = compress(
+            self.body if render is None else render(self.body), fast=fast
+        )
+        self.variant = variant
+
+    def encoded_body(
+        self,
+        encoding: str,
+        render: Callable[[bytes], bytes] | None = None,
+        variant: str = "",
+    ) -> bytes:
+        """
+        Get compressed body, compressing it again if render output has changed.
+        It's done on request path, so only the requested encoding is compressed
+        (with fast compression level).
+        """
+        if self.variant != variant:
+            self.encoded = {}
+            self.variant = variant
+        if encoding not in self.encoded:
+            self.encoded.update(
+                compress(
+                    self.body if render is None else render(self.body),
+                    fast=True,
+                    encodings=(encoding,),
+                )
+            )
+        return self.encoded[encoding]
+
+    @property
+    def fresh(self) -> bool:
+        """Whether entry is not logically expired."""
+        return time.time() < self.fresh_until
+
+    def to_mapping(self) -> Dict[str, bytes | float | str]:
+        """
+        Convert entry to redis hash mapping.
+        Body is stored compressed (it's needed only to render other variants).
+        """
+        mapping: Dict[str, bytes | float | str] = {
+            "zbody": zlib.compress(self.body, 9),
+            "fresh_until": self.fresh_until,
+            "etag": self.etag,
+            "modified": self.modified,
+        }
+        if self.variant is not None:
+            mapping["variant"] = self.variant
+            for encoding, encoded in self.encoded.items():
+                mapping[f"body:{encoding}"] = encoded
+        return mapping
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[bytes, bytes]) -> "CacheEntry":
+        """Make entry from redis hash mapping."""
+        etag: bytes | None = mapping.get(b"etag")
+        modified: bytes | None = mapping.get(b"modified")
+        variant: bytes | None = mapping.get(b"variant")
+        zbody: bytes | None = mapping.get(b"zbody")
+        return cls(
+            body=zlib.decompress(zbody) if zbody is not None else mapping[b"body"],
+            fresh_until=float(mapping[b"fresh_until"]),
+            etag=etag.decode() if etag is not None else None,
+            modified=float(modified) if modified is not None else None,
+            variant=variant.decode() if variant is not None else None,
+            encoded={
+                key[len(b"body:") :].decode(): value
+                for key, value in mapping.items()
+                if key.startswith(b"body:")
+            },
+        )
+
+
+def cache_entry(data: bytes, fresh_until: float, fast: bool = False) -> CacheEntry:
+    """
+    Make precompressed cache entry.
+    :param data: serialized data
+    :param fresh_until: time until which entry is fresh
+    :param fast: whether to use fast compression levels (on request path)
+    :return: cache entry
+    """
+    entry = CacheEntry(wrap_data(data, cached=True), fresh_until)
+    entry.precompress(fast=fast)
+    return entry
+
+
+# Makes cache entry from serialized data, fresh_until and fast (see cache_entry)
+EntryFactory = Callable[..., CacheEntry]
+
+
+def cached_response(
+    request: Request,
+    entry: CacheEntry,
+    render: Callable[[bytes], bytes] | None = None,
+    variant: str = "",
+    not_before: float = 0,
+) -> Response:
+    """
+    Make response from cache entry with ETag, Last-Modified and Cache-Control headers.
+    If request validators match, 304 is returned without rendering the body.
+    Precompressed body is sent if client accepts its encoding.
+    :param request: request
+    :param entry: cache entry
+    :param render: function applied to the body before it's sent
+    :param variant: ETag suffix identifying render output (e.g. current weeks dates)
+    :param not_before: time render output last changed (the least Last-Modified)
+    :return: response
+    """
+    encoding: str | None = _accepted_encoding(request)
+    etag = '"' + "-".join(filter(None, (entry.etag, variant, encoding))) + '"'
+    modified = int(max(entry.modified, not_before))
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Last-Modified": formatdate(modified, usegmt=True),
+        "Cache-Control": (
+            f"public, max-age={settings.maxage}, "
+            f"stale-while-revalidate={settings.grace}"
+        ),
+    }
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        body = entry.encoded_body(encoding, render=render, variant=variant)
+    else:
+        body = entry.body if render is None else render(entry.body)
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def _accepted_encoding(request: Request) -> str | None:
+    """Get the most preferred of ENCODINGS accepted by client (None for identity)."""
+    if not (header := request.headers.get("accept-encoding")):
+        return None
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        quality: float = 1
+        if (params := params.strip()).startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[coding.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def _not_modified(request: Request, etag: str, modified: int) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if (if_none_match := request.headers.get("if-none-match")) is not None:
+        return if_none_match.strip() == "*" or etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        )
+    if (if_modified_since := request.headers.get("if-modified-since")) is not None:
+        try:
+            return modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class LRUCache:
+    """Size bounded in-process LRU cache with TTL."""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, Tuple[float, CacheEntry]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Get value by key or None if it's missing or expired."""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: str, value: CacheEntry) -> None:
+        """Set value and evict least recently used entries if cache is full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, keys: Iterable[str]) -> None:
+        """Delete entries by keys."""
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Delete all entries."""
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int | float]:
+        """Cache counters."""
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+local_cache = LRUCache()
+# Rebuilds in progress in this worker, so concurrent misses share one rebuild
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def configure_cache(config: CacheConfig) -> None:
+    """Apply cache config. Called once on app startup."""
+    for name, value in config:
+        setattr(settings, name, value)
+    local_cache.maxsize = config.size
+    local_cache.ttl = config.ttl
+
+
+async def cache_get(redis: Redis, key: str) -> CacheEntry | None:
+    """Get entry from local cache, falling back to redis if it's missing or stale."""
+    if (entry := local_cache.get(key)) is not None and entry.fresh:
+        return entry
+    if not (mapping := await redis.hgetall(key)):
+        return None
+    entry = CacheEntry.from_mapping(mapping)
+    local_cache.set(key, entry)
+    return entry
+
+
+async def cache_get_many(redis: Redis, keys: Iterable[str]) -> Dict[str, CacheEntry]:
+    """
+    Get fresh entries from local cache, falling back to redis (in one round trip)
+    for missing or stale ones.
+    :param redis: redis
+    :param keys: cache keys
+    :return: {key: entry} of found fresh entries
+    """
+    entries: Dict[str, CacheEntry] = {}
+    missing: List[str] = []
+    for key in keys:
+        if (entry := local_cache.get(key)) is not None and entry.fresh:
+            entries[key] = entry
+        else:
+            missing.append(key)
+    if not missing:
+        return entries
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in missing:
+            pipe.hgetall(key)
+        mappings: List[Dict[bytes, bytes]] = await pipe.execute()
+    for key, mapping in zip(missing, mappings):
+        if mapping and (entry := CacheEntry.from_mapping(mapping)).fresh:
+            local_cache.set(key, entry)
+            entries[key] = entry
+    return entries
+
+
+async def cache_set(redis: Redis, key: str, entry: CacheEntry) -> None:
+    """Set entry to redis and local cache. Redis keeps it for the grace period too."""
+    ttl = int(entry.fresh_until - time.time()) + settings.grace
+    async with redis.pipeline(transaction=True) as pipe:
+        # Previous entry could have fields (variants) this one doesn't have
+        pipe.delete(key)
+        await pipe.hset(key, mapping=entry.to_mapping()).expire(key, ttl).execute()
+    local_cache.set(key, entry)
+
+
+async def cache_set_many(
+    redis: Redis, entries: Iterable[Tuple[str, CacheEntry]], batch: int = 500
+) -> int:
+    """
+    Set many entries with pipelined writes and drop their stale copies
+    from local caches of every worker. Entries are taken from the iterable
+    in a thread, so building them (e.g. serialization and compression in
+    a generator) doesn't block the event loop.
+    :param redis: redis
+    :param entries: (key, entry) pairs
+    :param batch: number of entries written per pipeline round trip
+    :return: number of bytes written (bodies and their compressed variants)
+    """
+    written = 0
+    iterator: Iterator[Tuple[str, CacheEntry]] = iter(entries)
+    async with redis.pipeline(transaction=False) as pipe:
+        while mappings := await asyncio.to_thread(_take_mappings, iterator, batch):
+            keys: List[str] = []
+            for key, fresh_until, mapping in mappings:
+                ttl = int(fresh_until - time.time()) + settings.grace
+                pipe.delete(key).hset(key, mapping=mapping).expire(key, ttl)
+                keys.append(key)
+                written += sum(
+                    len(value) for value in mapping.values() if isinstance(value, bytes)
+                )
+            await _flush_many(pipe, redis, keys)
+    return written
+
+
+def _take_mappings(
+    entries: Iterator[Tuple[str, CacheEntry]], count: int
+) -> List[Tuple[str, float, Dict[str, bytes | float | str]]]:
+    return [
+        (key, entry.fresh_until, entry.to_mapping())
+        for key, entry in islice(entries, count)
+    ]
+
+
+async def _flush_many(pipe: Pipeline, redis: Redis, keys: List[str]) -> None:
+    await pipe.execute()
+    local_cache.delete(keys)
+    await redis.publish(INVALIDATION_CHANNEL, encode_json(keys))
+
+
+async def cache_fetch(
+    redis: Redis,
+    key: str,
+    build: Callable[[], Awaitable[bytes]],
+    ttl: int,
+    make_entry: EntryFactory = cache_entry,
+) -> CacheEntry:
+    """
+    Get entry from cache or build it.
+    Concurrent misses in a worker share one rebuild, and workers coordinate
+    through a redis lock. Stale entry is served while it's being refreshed.
+    :param redis: redis
+    :param key: cache key
+    :param build: coroutine function which returns serialized data
+    :param ttl: seconds for which built entry is fresh
+    :param make_entry: makes precompressed entry to cache from the built data
+    (e.g. timetable_entry), it's called with fast=True
+    :return: entry (built one is served as it's stored, with its ETag and variants)
+    """
+    entry = await cache_get(redis, key)
+    if entry is not None and entry.fresh:
+        return entry
+    task = _single_flight(
+        redis, key, partial(_build_and_set, redis, key, build, ttl, make_entry), entry
+    )
+    if entry is not None:
+        return entry
+    return await asyncio.shield(task)
+
+
+def _single_flight(
+    redis: Redis,
+    key: str,
+    fill: Callable[[], Awaitable[CacheEntry]],
+    stale: CacheEntry | None,
+) -> asyncio.Task:
+    if (task := _inflight.get(key)) is None:
+        task = asyncio.create_task(_rebuild(redis, key, fill, stale))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _rebuild_done(key, t))
+    return task
+
+
+def _rebuild_done(key: str, task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if not task.cancelled() and (e := task.exception()) is not None:
+        logging.error("Error while rebuilding cache key %s: %s", key, e)
+
+
+async def _rebuild(
+    redis: Redis,
+    key: str,
+    fill: Callable[[], Awaitable[CacheEntry]],
+    stale: CacheEntry | None,
+) -> CacheEntry:
+    lock = redis.lock(f"lock:{key}", timeout=settings.lock)
+    if not await lock.acquire(blocking=False):
+        if stale is not None:
+            # Another worker is already refreshing it
+            return stale
+        # Wait for another worker to fill the key, but not longer than its lock
+        deadline = time.monotonic() + settings.lock
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            if mapping := await redis.hgetall(key):
+                entry = CacheEntry.from_mapping(mapping)
+                local_cache.set(key, entry)
+                return entry
+        return await fill()
+    try:
+        return await fill()
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            logging.warning("Cache lock for %s expired before rebuild finished", key)
+
+
+async def _build_and_set(
+    redis: Redis,
+    key: str,
+    build: Callable[[], Awaitable[bytes]],
+    ttl: int,
+    make_entry: EntryFactory,
+) -> CacheEntry:
+    data: bytes = await build()
+    entry: CacheEntry = make_entry(data, time.time() + ttl, fast=True)
+    await cache_set(redis, key, entry)
+    # Same body as later hits, so its ETag matches and it isn't compressed again
+    return entry
+
+
+async def invalidate(redis: Redis, keys: Iterable[str]) -> None:
+    """Delete keys from redis and local caches of every worker."""
+    keys = list(keys)
+    if not keys:
+        return
+    await redis.delete(*keys)
+    local_cache.delete(keys)
+    await redis.publish(INVALIDATION_CHANNEL, encode_json(keys))
+
+
+async def listen_invalidations(redis: Redis) -> None:
+    """Drop local cache entries invalidated by other workers."""
+
+    async def on_subscribe() -> None:
+        # Messages published while it wasn't subscribed are lost
+        local_cache.clear()
+
+    async def on_message(data: bytes) -> None:
+        local_cache.delete(ujson.loads(data))
+
+    await listen_channel(redis, INVALIDATION_CHANNEL, on_subscribe, on_message)
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Sequence, Set
+
+import ujson
+from redis.asyncio import Redis
+
+from app.cache import (
+    FACULTIES_KEY,
+    CacheEntry,
+    cache_entry,
+    cache_set_many,
+    encode_json,
+    group_key,
+    invalidate,
+    room_key,
+    settings,
+    teacher_key,
+)
+from app.misc.room_index import room_index
+from app.misc.timetable import (
+    FACULTIES_TTL,
+    GROUP_TTL,
+    ROOM_TTL,
+    TEACHER_TTL,
+    encode_faculties,
+    encode_lessons,
+    encode_merged_lessons,
+    timetable_entry,
+)
+from db.models import Lesson
+from db.repo import Repo, lesson_row, lessons_hash
+
+WARMUP_STATS_KEY = "stats:warmup"
+SYNC_STATS_KEY = "stats:sync"
+# {group_id: json list of ids of the group teachers} as of the last cache refresh
+GROUP_TEACHERS_KEY = "index:group_teachers"
+# {group_id: json list of rooms of the group lessons} as of the last rooms refresh
+GROUP_ROOMS_KEY = "index:group_rooms"
+
+
+async def load_groups_lessons(
+    repo: Repo, groups_ids: Iterable[int] | None = None
+) -> Dict[int, List[Lesson]]:
+    """
+    Get lessons of groups (from one query).
+    :param repo: db repo
+    :param groups_ids: ids of groups (all groups by default)
+    :return: {group_id: lessons}
+    """
+    if groups_ids is None:
+        lessons: Dict[int, List[Lesson]] = {
+            group_id: [] for group_id in await repo.get_groups_ids()
+        }
+        all_lessons: Sequence[Lesson] = await repo.get_all_lessons()
+    else:
+        lessons = {group_id: [] for group_id in groups_ids}
+        all_lessons = await repo.get_groups_lessons(lessons)
+    for lesson in all_lessons:
+        if lesson.group_id in lessons:
+            lessons[lesson.group_id].append(lesson)
+    return lessons
+
+
+async def touched_teachers(redis: Redis, lessons: Dict[int, List[Lesson]]) -> Set[int]:
+    """
+    Get teachers whose timetable is affected by groups lessons update:
+    ones who teach the groups now and ones who taught them before.
+    :param redis: redis
+    :param lessons: {group_id: lessons} of updated groups
+    :return: ids of teachers
+    """
+    if not lessons:
+        return set()
+    teachers_ids: Set[int] = {
+        lesson.teacher_id
+        for group_lessons in lessons.values()
+        for lesson in group_lessons
+    }
+    for previous in await redis.hmget(GROUP_TEACHERS_KEY, list(lessons)):
+        if previous is not None:
+            teachers_ids.update(ujson.loads(previous))
+    return teachers_ids
+
+
+async def save_groups_teachers(redis: Redis, lessons: Dict[int, List[Lesson]]) -> None:
+    """
+    Remember teachers of groups, so next update knows whom they taught.
+    :param redis: redis
+    :param lessons: {group_id: lessons} of updated groups
+    """
+    if lessons:
+        await redis.hset(
+            GROUP_TEACHERS_KEY,
+            mapping={
+                group_id: encode_json(
+                    sorted({lesson.teacher_id for lesson in group_lessons})
+                )
+                for group_id, group_lessons in lessons.items()
+            },
+        )
+
+
+async def warm_teachers(repo: Repo, redis: Redis, teachers_ids: Iterable[int]) -> int:
+    """
+    Build timetables of teachers and write them to cache.
+    :param repo: db repo
+    :param redis: redis
+    :param teachers_ids: ids of teachers
+    :return: number of bytes written
+    """
+    lessons: Dict[int, List[Lesson]] = {teacher_id: [] for teacher_id in teachers_ids}
+    if not lessons:
+        return 0
+    for lesson in await repo.get_teachers_lessons(lessons):
+        lessons[lesson.teacher_id].append(lesson)
+    fresh_until: float = time.time() + TEACHER_TTL
+    return await cache_set_many(
+        redis,
+        (
+            (
+                teacher_key(teacher_id),
+                timetable_entry(encode_merged_lessons(teacher_lessons), fresh_until),
+            )
+            for teacher_id, teacher_lessons in lessons.items()
+        ),
+    )
+
+
+async def touched_rooms(
+    redis: Redis, group_id: int, lessons: List[Lesson]
+) -> Set[str] | None:
+    """
+    Get rooms whose timetable is affected by the group lessons update:
+    ones where the group has lessons now and ones where it had them before.
+    :param redis: redis
+    :param group_id: id of the updated group
+    :param lessons: lessons of the group
+    :return: names of rooms or None if previous rooms of the group are unknown
+    """
+    previous: bytes | None = await redis.hget(GROUP_ROOMS_KEY, group_id)
+    if previous is None:
+        return None
+    return {lesson.auditory for lesson in lessons if lesson.auditory}.union(
+        ujson.loads(previous)
+    )
+
+
+async def save_groups_rooms(
+    redis: Redis, lessons: Dict[int, List[Lesson]], replace: bool = False
+) -> None:
+    """
+    Remember rooms of groups, so next update knows where they had lessons.
+    :param redis: redis
+    :param lessons: {group_id: lessons} of groups
+    :param replace: whether to drop rooms of other groups (lessons are of all groups)
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        if replace:
+            pipe.delete(GROUP_ROOMS_KEY)
+        if lessons:
+            pipe.hset(
+                GROUP_ROOMS_KEY,
+                mapping={
+                    group_id: encode_json(
+                        sorted({lesson.auditory for lesson in group_lessons} - {""})
+                    )
+                    for group_id, group_lessons in lessons.items()
+                },
+            )
+        await pipe.execute()
+
+
+async def refresh_rooms(
+    repo: Repo, redis: Redis, rooms: Set[str] | None = None
+) -> None:
+    """
+    Rebuild rooms occupancy index and refresh cached timetables of rooms
+    (warm them if it's enabled in config, otherwise just invalidate).
+    :param repo: db repo
+    :param redis: redis
+    :param rooms: names of rooms to refresh (all rooms by default)
+    """
+    lessons: Dict[str, List[Lesson]] = {}
+    for lesson in await repo.get_rooms_lessons(rooms):
+        lessons.setdefault(lesson.auditory, []).append(lesson)
+    all_lessons: List[Lesson] = [
+        lesson for room_lessons in lessons.values() for lesson in room_lessons
+    ]
+    removed: Set[str]
+    if rooms is None:
+        removed = await room_index.rebuild(redis=redis, lessons=all_lessons)
+        groups_lessons: Dict[int, List[Lesson]] = {
+            group_id: [] for group_id in await repo.get_groups_ids()
+        }
+        for lesson in all_lessons:
+            groups_lessons.setdefault(lesson.group_id, []).append(lesson)
+        await save_groups_rooms(redis=redis, lessons=groups_lessons, replace=True)
+    else:
+        removed = await room_index.update(redis=redis, rooms=rooms, lessons=all_lessons)
+    await invalidate(redis, map(room_key, removed))
+    if not settings.warmup:
+        await invalidate(redis, map(room_key, lessons))
+        return
+    fresh_until: float = time.time() + ROOM_TTL
+    await cache_set_many(
+        redis,
+        (
+            (
+                room_key(room),
+                timetable_entry(encode_merged_lessons(room_lessons), fresh_until),
+            )
+            for room, room_lessons in lessons.items()
+        ),
+    )
+
+
+async def warm_cache(
+    repo: Repo,
+    redis: Redis,
+    lessons: Dict[int, List[Lesson]] | None = None,
+    teachers_ids: Set[int] | None = None,
+) -> Dict[str, int | float]:
+    """
+    Build timetables of groups and teachers and faculties list and write them to cache.
+    :param repo: db repo
+    :param redis: redis
+    :param lessons: {group_id: lessons} of groups to warm (all groups by default)
+    :param teachers_ids: ids of teachers to warm (teachers of the groups by default)
+    :return: number of warmed keys, seconds it took and bytes written
+    """
+    start = time.perf_counter()
+    if lessons is None:
+        lessons = await load_groups_lessons(repo=repo)
+    if teachers_ids is None:
+        teachers_ids = {
+            lesson.teacher_id
+            for group_lessons in lessons.values()
+            for lesson in group_lessons
+        }
+
+    fresh_until: float = time.time() + GROUP_TTL
+    written: int = await cache_set_many(
+        redis,
+        (
+            (
+                group_key(group_id),
+                timetable_entry(encode_lessons(group_lessons), fresh_until),
+            )
+            for group_id, group_lessons in lessons.items()
+        ),
+    )
+    # Compressed in a thread, like entries in cache_set_many
+    faculties: CacheEntry = await asyncio.to_thread(
+        cache_entry, await encode_faculties(repo=repo), time.time() + FACULTIES_TTL
+    )
+    written += await cache_set_many(redis, [(FACULTIES_KEY, faculties)])
+    written += await warm_teachers(repo=repo, redis=redis, teachers_ids=teachers_ids)
+
+    report: Dict[str, int | float] = {
+        "keys": len(lessons) + len(teachers_ids) + 1,
+        "seconds": round(time.perf_counter() - start, 3),
+        "bytes": written,
+    }
+    await redis.hset(WARMUP_STATS_KEY, mapping=report)
+    logging.info(
+        "Cache warmed: %i keys, %i bytes in %.3f s",
+        report["keys"],
+        report["bytes"],
+        report["seconds"],
+    )
+    return report
+
+
+async def refresh_groups_cache(
+    repo: Repo, redis: Redis, groups_ids: Iterable[int]
+) -> None:
+    """
+    Refresh cached timetables after groups lessons update.
+    Only groups whose lessons hash changed (and their current and previous
+    teachers) are touched. Their cache is warmed if it's enabled in config,
+    otherwise entries are just invalidated. Rooms are refreshed if any group changed.
+    :param repo: db repo
+    :param redis: redis
+    :param groups_ids: ids of updated groups
+    """
+    lessons: Dict[int, List[Lesson]] = await load_groups_lessons(repo, groups_ids)
+    stored_hashes: Dict[int, str | None] = await repo.get_groups_hashes()
+    changed_hashes: Dict[int, str] = {}
+    for group_id, group_lessons in lessons.items():
+        group_hash: str = lessons_hash(map(lesson_row, group_lessons))
+        if stored_hashes.get(group_id) != group_hash:
+            changed_hashes[group_id] = group_hash
+
+    report: Dict[str, int] = {
+        "changed": len(changed_hashes),
+        "unchanged": len(lessons) - len(changed_hashes),
+    }
+    await redis.hset(SYNC_STATS_KEY, mapping=report)
+    logging.info(
+        "Groups lessons synced: %i changed, %i unchanged",
+        report["changed"],
+        report["unchanged"],
+    )
+
+    changed: Dict[int, List[Lesson]] = {
+        group_id: lessons[group_id] for group_id in changed_hashes
+    }
+    # Snapshots are saved before cache is refreshed, so cache misses filled
+    # meanwhile (from snapshots) don't bring back the previous timetable.
+    # Sync could write lessons bypassing Repo, so they're saved here.
+    await repo.save_group_timetables(changed)
+    teachers_ids: Set[int] = await touched_teachers(redis=redis, lessons=changed)
+    if settings.warmup:
+        await warm_cache(
+            repo=repo, redis=redis, lessons=changed, teachers_ids=teachers_ids
+        )
+    else:
+        await invalidate(
+            redis, [*map(group_key, changed), *map(teacher_key, teachers_ids)]
+        )
+    if changed:
+        await refresh_rooms(repo=repo, redis=redis)
+    # Hashes are saved only after cache is refreshed, so failed refresh is retried
+    await save_groups_teachers(redis=redis, lessons=changed)
+    await repo.set_groups_hashes(changed_hashes)
+
+
+async def invalidate_group(repo: Repo, redis: Redis, group_id: int) -> None:
+    """
+    Invalidate cached timetable of the group and of its current and previous teachers.
+    Group timetable snapshot is refreshed too, and so are rooms where the group
+    has or had lessons (all rooms if previous ones are unknown).
+    Group lessons hash is saved last, like in refresh_groups_cache.
+    :param repo: db repo
+    :param redis: redis
+    :param group_id: id of the updated group
+    """
+    lessons: Dict[int, List[Lesson]] = {
+        group_id: list(await repo.get_group_lessons(group_id=group_id))
+    }
+    await repo.save_group_timetables(lessons)
+    teachers_ids: Set[int] = await touched_teachers(redis=redis, lessons=lessons)
+    rooms: Set[str] | None = await touched_rooms(
+        redis=redis, group_id=group_id, lessons=lessons[group_id]
+    )
+    await invalidate(redis, [group_key(group_id), *map(teacher_key, teachers_ids)])
+    await save_groups_teachers(redis=redis, lessons=lessons)
+    await save_groups_rooms(redis=redis, lessons=lessons)
+    if rooms is None or rooms:
+        await refresh_rooms(repo=repo, redis=redis, rooms=rooms)
+    await repo.set_groups_hashes(
+        {group_id: lessons_hash(map(lesson_row, lessons[group_id]))}
+    )
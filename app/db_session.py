@@ -1,18 +1,65 @@
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, TypeVar
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, AsyncSession
 
-from config_reader import load_config, Config
+from db.db import TimedQueuePool
 from db.repo import Repo
-from db.db import sa_sessionmaker
 
+T = TypeVar("T")
 
-config: Config = load_config()
-session_factory: async_sessionmaker[AsyncSession] = sa_sessionmaker(config.postgres)
 
+def get_db_pool_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    """Function to get connection pool statistics."""
+    pool: TimedQueuePool = engine.pool  # type: ignore[assignment]
+    # SQLAlchemy doesn't expose max overflow, so we read pool internals
+    # pylint: disable=protected-access
+    capacity: int = pool.size() + pool._max_overflow
+    in_use: int = pool.checkedout()
+    return {
+        "max": capacity,
+        "size": pool.size(),
+        "in_use": in_use,
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "utilization": round(in_use / capacity, 3),
+        "checkouts": pool.checkouts,
+        "wait_avg_ms": round(pool.wait_total / (pool.checkouts or 1) * 1000, 3),
+        "wait_max_ms": round(pool.wait_max * 1000, 3),
+    }
 
-async def get_session() -> AsyncGenerator[Repo, None]:
+
+def in_own_session(
+    session_factory: async_sessionmaker[AsyncSession],
+    func: Callable[[Repo], Awaitable[T]],
+) -> Callable[[], Awaitable[T]]:
+    """
+    Make function which calls func with a repo of its own session.
+    Cache builds use it, because they can outlive the request which started them.
+    :param session_factory: db session factory
+    :param func: coroutine function which takes repo
+    :return: coroutine function without arguments
+    """
+
+    async def call() -> T:
+        async with session_factory() as session:
+            return await func(Repo(session=session))
+
+    return call
+
+
+async def get_session_factory(
+    request: Request,
+) -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    """Function to get session factory (for work that can outlive the request)"""
+    session_factory: async_sessionmaker[AsyncSession] = (
+        request.app.state.session_factory
+    )
+    yield session_factory
+
+
+async def get_session(request: Request) -> AsyncGenerator[Repo, None]:
     """Function to get a Repo"""
-    async with session_factory() as session:
+    async with request.app.state.session_factory() as session:
         repo: Repo = Repo(session=session)
         yield repo
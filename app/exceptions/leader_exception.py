@@ -0,0 +1,2 @@
+class NotLeaderError(Exception):
+    """Exception if the worker lost the leader lease while running a task"""
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+
+import backoff
+from aiohttp import ClientError
+from redis.asyncio import Redis
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.cache_warmup import refresh_groups_cache
+from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from app.utils import update_groups_lessons, update_teachers
+from config_reader import JetIQ as JetIQConfig
+from db.repo import Repo
+
+settings: JetIQConfig = JetIQConfig()
+
+
+def configure_sync(config: JetIQConfig) -> None:
+    """Apply JetIQ config. Called once on worker startup."""
+    for name, value in config:
+        setattr(settings, name, value)
+
+
+class SyncProgress:
+    """
+    Progress of the groups lessons sync run. It's stored in redis,
+    so a failed run can be resumed by retrying only failed and pending groups.
+    """
+
+    RUN_KEY = "sync:lessons:run"
+    PENDING_KEY = "sync:lessons:pending"
+    FAILED_KEY = "sync:lessons:failed"
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+
+    async def start(self, groups_ids: Iterable[int]) -> List[int]:
+        """
+        Start new run.
+        :param groups_ids: ids of groups to sync
+        :return: ids of groups to sync
+        """
+        groups_ids = list(groups_ids)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.RUN_KEY, self.PENDING_KEY, self.FAILED_KEY)
+            if groups_ids:
+                pipe.sadd(self.PENDING_KEY, *groups_ids)
+            pipe.hset(
+                self.RUN_KEY,
+                mapping={
+                    "id": uuid.uuid4().hex,
+                    "status": "running",
+                    "started_at": datetime.now().isoformat(timespec="seconds"),
+                    "total": len(groups_ids),
+                    "done": 0,
+                },
+            )
+            await pipe.execute()
+        return groups_ids
+
+    async def unfinished(self) -> bool:
+        """Whether the last run has failed or was interrupted."""
+        return await self.redis.hget(self.RUN_KEY, "status") in (b"running", b"failed")
+
+    async def resume(self) -> List[int] | None:
+        """
+        Resume unfinished run.
+        :return: ids of failed and pending groups or None if there's nothing to resume
+        """
+        if not await self.unfinished():
+            return None
+        groups_ids = list(await self.pending())
+        await self.redis.hset(self.RUN_KEY, "status", "running")
+        return groups_ids
+
+    async def pending(self) -> Set[int]:
+        """Ids of groups which are not synced yet in the current run (or failed)."""
+        return {
+            int(group_id) for group_id in await self.redis.smembers(self.PENDING_KEY)
+        }
+
+    async def done(self, group_id: int) -> None:
+        """Mark group as synced."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.srem(self.PENDING_KEY, group_id)
+            pipe.hdel(self.FAILED_KEY, group_id)
+            pipe.hincrby(self.RUN_KEY, "done", 1)
+            await pipe.execute()
+
+    async def fail(self, group_id: int, error: BaseException) -> None:
+        """Mark group as failed (it stays pending for the next retry)."""
+        await self.redis.hset(self.FAILED_KEY, group_id, repr(error))
+
+    async def finish(self, failed: bool) -> None:
+        """Finish run."""
+        await self.redis.hset(
+            self.RUN_KEY, "status", "failed" if failed else "finished"
+        )
+
+    async def status(self) -> Dict[str, Any]:
+        """
+        Status of the last run.
+        :return: run id, status, start time, total/done/pending groups count and errors
+        """
+        run: Dict[str, Any] = {
+            key.decode(): value.decode()
+            for key, value in (await self.redis.hgetall(self.RUN_KEY)).items()
+        }
+        for counter in ("total", "done"):
+            if counter in run:
+                run[counter] = int(run[counter])
+        return {
+            **run,
+            "pending": await self.redis.scard(self.PENDING_KEY),
+            "failed": {
+                int(group_id): error.decode()
+                for group_id, error in (
+                    await self.redis.hgetall(self.FAILED_KEY)
+                ).items()
+            },
+        }
+
+
+async def sync_groups_lessons(
+    session_factory: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    groups_ids: Iterable[int],
+    resume: bool = False,
+    concurrency: int | None = None,
+) -> None:
+    """
+    Update lessons of groups concurrently. Every group is updated in its own
+    db session, and number of groups updated at once is bounded.
+    Failed requests to JetIQ are retried with exponential backoff. Progress
+    is checkpointed, so resumed run syncs only failed and pending groups.
+    First error (JetIQStatusCodeError, ClientError, IntegrityError...) is raised
+    after all groups are processed.
+    :param session_factory: db session factory
+    :param redis: redis
+    :param groups_ids: ids of groups to update
+    :param resume: whether to resume the unfinished run (new run is started if none)
+    :param concurrency: max number of groups updated at once
+    (JETIQ_CONCURRENCY by default)
+    """
+    progress = SyncProgress(redis=redis)
+    pending: List[int] | None = await progress.resume() if resume else None
+    if pending is None:
+        pending = await progress.start(groups_ids)
+    else:
+        logging.info("Resuming groups lessons sync: %i groups left", len(pending))
+    semaphore = asyncio.Semaphore(concurrency or settings.concurrency)
+
+    @backoff.on_exception(
+        backoff.expo,
+        (ClientError, JetIQStatusCodeError),
+        max_tries=settings.tries,
+    )
+    async def update_group(group_id: int) -> None:
+        async with session_factory() as session:
+            await update_groups_lessons(
+                repo=Repo(session=session), redis=redis, groups_ids=[group_id]
+            )
+
+    async def sync_group(group_id: int) -> None:
+        async with semaphore:
+            try:
+                await update_group(group_id)
+            except Exception as e:
+                await progress.fail(group_id, e)
+                raise
+        await progress.done(group_id)
+
+    results = await asyncio.gather(
+        *(sync_group(group_id) for group_id in pending), return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    await progress.finish(failed=bool(errors))
+    if errors:
+        raise errors[0]
+
+
+async def sync_all_groups_lessons(
+    session_factory: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    resume: bool = False,
+) -> None:
+    """
+    Update lessons of all groups and refresh their cache. If lessons reference
+    unknown teachers (IntegrityError), teachers are updated and the run is resumed,
+    so only failed and pending groups are synced again.
+    If some groups fail, cache of the synced ones is still refreshed
+    before the error is raised.
+    :param session_factory: db session factory
+    :param redis: redis
+    :param resume: whether to resume the unfinished run (new run is started if none)
+    """
+    async with session_factory() as session:
+        repo: Repo = Repo(session=session)
+        groups_ids: list[int] = [group.id for group in await repo.get_groups()]
+        try:
+            await sync_groups_lessons(
+                session_factory=session_factory,
+                redis=redis,
+                groups_ids=groups_ids,
+                resume=resume,
+            )
+        except IntegrityError:
+            logging.info(
+                "Error while updating groups lessons table. Problem with teachers"
+            )
+            await update_teachers(repo=repo)
+            logging.info("Updated teachers")
+            await sync_groups_lessons(
+                session_factory=session_factory,
+                redis=redis,
+                groups_ids=groups_ids,
+                resume=True,
+            )
+            logging.info("Updated groups lessons")
+        finally:
+            pending: Set[int] = await SyncProgress(redis=redis).pending()
+            await refresh_groups_cache(
+                repo=repo,
+                redis=redis,
+                groups_ids=[
+                    group_id for group_id in groups_ids if group_id not in pending
+                ],
+            )
@@ -0,0 +1,173 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+import ujson
+from redis.asyncio import Redis
+
+from app.cache import encode_json
+from app.ingest import SyncProgress
+
+GROUPS_LESSONS_JOB = "groups_lessons"
+FACULTIES_GROUPS_JOB = "faculties_groups"
+TEACHERS_JOB = "teachers"
+
+# Create the job only if there's no queued or running job of the same kind
+_ENQUEUE_SCRIPT = """
+local inflight = redis.call('get', KEYS[1])
+if inflight then
+    return {0, inflight}
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[4])
+redis.call('hset', KEYS[2], 'id', ARGV[1], 'kind', ARGV[2], 'status', 'queued',
+    'created_at', ARGV[3], 'params', ARGV[6])
+redis.call('expire', KEYS[2], ARGV[5])
+redis.call('lpush', KEYS[3], ARGV[1])
+return {1, ARGV[1]}
+"""
+# Free the job kind only if it's still taken by this job (after the cooldown)
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    if tonumber(ARGV[2]) > 0 then
+        return redis.call('expire', KEYS[1], ARGV[2])
+    end
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """
+    Redis queue of sync jobs, which are run by the worker process (app.worker).
+    Only one job of a kind can be queued or running at once. Kinds with a cooldown
+    can't be queued again for a while after their job is finished successfully.
+    Job status and result are kept in redis for a day after the job is finished.
+    """
+
+    QUEUE_KEY = "jobs:queue"
+    # If the worker dies with the job, the job kind is freed after this timeout
+    INFLIGHT_TTL = 3600
+    JOB_TTL = 86_400
+    # Seconds after the successful job before the next job of its kind
+    COOLDOWNS: Dict[str, int] = {GROUPS_LESSONS_JOB: 3600}
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self._enqueue = redis.register_script(_ENQUEUE_SCRIPT)
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def job_key(job_id: str) -> str:
+        """Redis key of the job."""
+        return f"job:{job_id}"
+
+    @staticmethod
+    def inflight_key(kind: str) -> str:
+        """Redis key of the queued or running job of the kind."""
+        return f"jobs:inflight:{kind}"
+
+    async def enqueue(
+        self, kind: str, params: Dict[str, Any] | None = None
+    ) -> Tuple[str, bool]:
+        """
+        Add job to the queue.
+        :param kind: job kind
+        :param params: keyword arguments of the job handler
+        :return: job id and whether it's a new job (if job of the same kind
+        is already in progress or cooling down, its id is returned)
+        """
+        job_id = uuid.uuid4().hex
+        created, job_id = await self._enqueue(
+            keys=[self.inflight_key(kind), self.job_key(job_id), self.QUEUE_KEY],
+            args=[
+                job_id,
+                kind,
+                _now(),
+                self.INFLIGHT_TTL,
+                self.JOB_TTL,
+                encode_json(params or {}),
+            ],
+        )
+        return job_id.decode() if isinstance(job_id, bytes) else job_id, bool(created)
+
+    async def next(self, timeout: int = 1) -> Dict[str, Any] | None:
+        """
+        Take the next job from the queue.
+        :param timeout: seconds to wait for a job
+        :return: job or None if the queue is empty
+        """
+        if (item := await self.redis.brpop([self.QUEUE_KEY], timeout=timeout)) is None:
+            return None
+        return await self.get(item[1].decode())
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        """
+        Get job.
+        :param job_id: job id
+        :return: job id, kind, params, status, timestamps, result or error;
+        None if not found
+        """
+        job: Dict[str, Any] = {
+            key.decode(): value.decode()
+            for key, value in (await self.redis.hgetall(self.job_key(job_id))).items()
+        }
+        if not job:
+            return None
+        for field in ("params", "result"):
+            if field in job:
+                job[field] = ujson.loads(job[field])
+        if job["kind"] == GROUPS_LESSONS_JOB and job["status"] == "running":
+            job["progress"] = await SyncProgress(redis=self.redis).status()
+        return job
+
+    async def start(self, job_id: str) -> None:
+        """Mark job as running."""
+        await self.redis.hset(
+            self.job_key(job_id), mapping={"status": "running", "started_at": _now()}
+        )
+
+    async def finish(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """
+        Mark job as finished (or failed if result has an error) and free its kind
+        (after the cooldown, if the job is finished).
+        :param job: job
+        :param result: message or error
+        """
+        key = self.job_key(job["id"])
+        failed: bool = "error" in result
+        mapping = {
+            "status": "failed" if failed else "finished",
+            "finished_at": _now(),
+            "result": encode_json(result),
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.hset(key, mapping=mapping).expire(key, self.JOB_TTL).execute()
+        cooldown: int = 0 if failed else self.COOLDOWNS.get(job["kind"], 0)
+        await self._release(
+            keys=[self.inflight_key(job["kind"])], args=[job["id"], cooldown]
+        )
+
+
+async def enqueue_job(
+    redis: Redis, kind: str, params: Dict[str, Any] | None = None
+) -> Dict[str, str]:
+    """
+    Queue job for the worker.
+    :param redis: redis
+    :param kind: job kind
+    :param params: keyword arguments of the job handler
+    :return: message and job id (to get its status at /v0/jobs/{job_id})
+    """
+    queue = JobQueue(redis=redis)
+    job_id, created = await queue.enqueue(kind, params)
+    if created:
+        return {"message": "Job queued", "job_id": job_id}
+    if (job := await queue.get(job_id)) is not None and job["status"] == "finished":
+        timeout: int = await redis.ttl(queue.inflight_key(kind))
+        return {"message": f"Job is finished. Timeout: {timeout}", "job_id": job_id}
+    return {"message": "Job is already in progress", "job_id": job_id}
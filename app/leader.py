@@ -0,0 +1,127 @@
+import logging
+import time
+import uuid
+from typing import Dict
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+from app.exceptions.leader_exception import NotLeaderError
+
+# Set the lease only if it's free and take a new fencing token
+_ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return 0
+"""
+# Prolong the lease only if we still own it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """
+    Redis lease for leader election between workers.
+    Every acquisition gets a new (greater) fencing token, so a worker which
+    lost the lease (e.g. after a long pause) can tell it's no longer the leader.
+    """
+
+    KEY = "leader:lease"
+    TOKEN_KEY = "leader:token"
+
+    def __init__(self, redis: Redis, lease: int) -> None:
+        """
+        :param redis: redis
+        :param lease: lease duration in seconds. It should be renewed more often.
+        """
+        self.redis = redis
+        self.lease = lease
+        self.owner: str = uuid.uuid4().hex
+        self.token: int | None = None
+        self._renewed_at: float = 0
+        self._scripts: Dict[str, AsyncScript] = {
+            name: redis.register_script(script)
+            for name, script in (
+                ("acquire", _ACQUIRE_SCRIPT),
+                ("renew", _RENEW_SCRIPT),
+                ("release", _RELEASE_SCRIPT),
+            )
+        }
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this worker holds the lease (as far as it knows)."""
+        return self.token is not None
+
+    async def keep(self) -> bool:
+        """
+        Acquire the lease if it's free or renew the held one.
+        :return: whether this worker is the leader
+        """
+        try:
+            if self.token is None:
+                token = await self._scripts["acquire"](
+                    keys=[self.KEY, self.TOKEN_KEY],
+                    args=[self.owner, self.lease * 1000],
+                )
+                if token:
+                    self.token = int(token)
+                    self._renewed_at = time.monotonic()
+                    logging.info("Became the leader, fencing token %i", self.token)
+            elif await self._scripts["renew"](
+                keys=[self.KEY], args=[self.owner, self.lease * 1000]
+            ):
+                self._renewed_at = time.monotonic()
+            else:
+                logging.warning("Lost the leader lease, fencing token %i", self.token)
+                self.token = None
+        except RedisError as e:
+            logging.error("Error while keeping the leader lease: %s", e)
+            # Lease can't be renewed, so it's surely expired after the lease period
+            if time.monotonic() - self._renewed_at >= self.lease:
+                self.token = None
+        return self.is_leader
+
+    async def validate(self) -> bool:
+        """
+        Check in redis that this worker still owns the lease with the same fencing token.
+        :return: whether this worker is still the leader
+        """
+        if self.token is None:
+            return False
+        owner, token = await self.redis.mget(self.KEY, self.TOKEN_KEY)
+        return (
+            owner == self.owner.encode()
+            and token is not None
+            and int(token) == self.token
+        )
+
+    async def check(self) -> None:
+        """
+        Checkpoint of a long leader task: stop the task if the lease is lost.
+        :raises NotLeaderError: if this worker is no longer the leader
+        """
+        if not await self.validate():
+            raise NotLeaderError(f"Lost the leader lease, fencing token {self.token}")
+
+    async def release(self) -> None:
+        """Release the lease, so another worker can take it without waiting."""
+        if self.token is None:
+            return
+        self.token = None
+        try:
+            await self._scripts["release"](keys=[self.KEY], args=[self.owner])
+        except RedisError as e:
+            logging.error("Error while releasing the leader lease: %s", e)
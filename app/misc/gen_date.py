@@ -1,13 +1,25 @@
 import datetime
+from functools import lru_cache
+from typing import Tuple
 
 
-def gen_weeks_dates() -> list[dict[int, str]]:
+def week_index(day: datetime.date) -> int:
+    """
+    Timetable week of the date.
+    :param day: date
+    :return: 0 for the first week, 1 for the second
+    """
+    return 0 if day.isocalendar()[1] % 2 == 0 else 1
+
+
+def gen_weeks_dates(today: datetime.date | None = None) -> list[dict[int, str]]:
     """
     Generate weeks dates. Returns a list where 0 element is 1-st week and 1 element is 2-nd week.
     Each week is a dict with keys {day_num: date} like so: {0: "22.04", 1: "23.04" ...}
+    :param today: date to generate weeks for (today by default)
     :return: [1 week with dates, 2 week with dates]
     """
-    today = datetime.date.today()
+    today = today or datetime.date.today()
 
     this_week_start = today - datetime.timedelta(days=today.weekday())
 
@@ -21,4 +33,36 @@ def gen_weeks_dates() -> list[dict[int, str]]:
         for week in range(2)
     ]
 
-    return weeks if today.isocalendar()[1] % 2 == 0 else weeks[::-1]
+    return weeks if week_index(today) == 0 else weeks[::-1]
+
+
+@lru_cache(maxsize=2)
+def _weeks_dates_table(today: datetime.date) -> Tuple[bytes, ...]:
+    first_week_dates, second_week_dates = gen_weeks_dates(today)
+    return tuple(
+        date.encode()
+        for week_dates in (first_week_dates, second_week_dates)
+        for date in week_dates.values()
+    )
+
+
+def weeks_dates_table() -> Tuple[bytes, ...]:
+    """
+    Dates of the first week days followed by the second week days (14 in total).
+    Memoized, so it's computed once per day.
+    :return: dates like (b"22.04", b"23.04", ...)
+    """
+    return _weeks_dates_table(datetime.date.today())
+
+
+def week_start(today: datetime.date | None = None) -> datetime.datetime:
+    """
+    Start (Monday midnight, local time) of the current week.
+    Weeks dates change only when it changes.
+    :param today: date to get week start for (today by default)
+    :return: datetime of the week start
+    """
+    today = today or datetime.date.today()
+    return datetime.datetime.combine(
+        today - datetime.timedelta(days=today.weekday()), datetime.time()
+    )
@@ -0,0 +1,94 @@
+import logging
+from array import array
+from bisect import bisect_left
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.redis_session import listen_channel
+from db.repo import Repo
+
+GROUPS_INDEX_CHANNEL = "groups_index"
+GROUPS_INDEX_VERSION_KEY = "groups_index_version"
+
+
+class GroupIndex:
+    """
+    In-process index of existing groups ids.
+    Ids are kept in a sorted int array, so lookup is a binary search.
+    Workers stay in sync through a version number published to redis.
+    """
+
+    def __init__(self) -> None:
+        self._ids: array = array("q")
+        self.version: int = 0
+        self.loaded: bool = False
+
+    def __contains__(self, group_id: int) -> bool:
+        i = bisect_left(self._ids, group_id)
+        return i < len(self._ids) and self._ids[i] == group_id
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def exists(self, group_id: int, repo: Repo) -> bool:
+        """
+        Check whether a group exists. Unknown ids are answered from the index too,
+        db is used only until the index is loaded.
+        """
+        if not self.loaded:
+            return await repo.check_group(group_id=group_id)
+        return group_id in self
+
+    async def load(self, repo: Repo, version: int) -> None:
+        """Load groups ids from db."""
+        self._ids = array("q", await repo.get_groups_ids())
+        self.version = version
+        self.loaded = True
+        logging.info("Groups index loaded: %i groups, version %i", len(self), version)
+
+    async def rebuild(self, repo: Repo, redis: Redis) -> None:
+        """Reload index after groups update and notify other workers."""
+        version: int = await redis.incr(GROUPS_INDEX_VERSION_KEY)
+        await self.load(repo=repo, version=version)
+        await redis.publish(GROUPS_INDEX_CHANNEL, version)
+
+    async def listen(
+        self, session_factory: async_sessionmaker[AsyncSession], redis: Redis
+    ) -> None:
+        """
+        Keep index up to date with versions published by other workers.
+        On redis or db errors (e.g. db isn't up yet) it reconnects and catches up.
+        """
+
+        async def on_subscribe() -> None:
+            # Catch up on anything published before we subscribed
+            version = int(await redis.get(GROUPS_INDEX_VERSION_KEY) or 0)
+            await self._reload(session_factory, version, force=not self.loaded)
+
+        async def on_message(data: bytes) -> None:
+            await self._reload(session_factory, int(data))
+
+        await listen_channel(
+            redis,
+            GROUPS_INDEX_CHANNEL,
+            on_subscribe,
+            on_message,
+            errors=(RedisError, SQLAlchemyError, OSError),
+        )
+
+    async def _reload(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        version: int,
+        force: bool = False,
+    ) -> None:
+        if not force and version <= self.version:
+            return
+        async with session_factory() as session:
+            await self.load(repo=Repo(session=session), version=version)
+
+
+group_index = GroupIndex()
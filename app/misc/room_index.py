@@ -0,0 +1,181 @@
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+from redis.asyncio import Redis
+
+from app.redis_session import listen_channel
+from db.models import DAYS, Lesson
+
+ROOMS_KEY = "index:rooms"
+ROOMS_INDEX_CHANNEL = "rooms_index"
+ROOMS_INDEX_VERSION_KEY = "rooms_index_version"
+# Max number of lessons (pairs) a day
+PAIRS = 10
+
+
+def slot_bit(week: int, dow: int, num: int) -> int:
+    """
+    Bit of the slot in the occupancy bitset.
+    :param week: 0 for the first week, 1 for the second
+    :param dow: day of the week (0 is Monday)
+    :param num: number of the lesson (from 1)
+    """
+    return 1 << ((week * len(DAYS) + dow) * PAIRS + num - 1)
+
+
+def slots_mask(week: int, dow: int, num_from: int, num_to: int) -> int:
+    """Bitset of the lessons from num_from to num_to (inclusive) of the day."""
+    mask = 0
+    for num in range(num_from, num_to + 1):
+        mask |= slot_bit(week, dow, num)
+    return mask
+
+
+def occupancy(lessons: Iterable[Lesson]) -> Dict[str, int]:
+    """
+    Build occupancy bitsets of rooms.
+    :param lessons: lessons of all groups
+    :return: {room: bitset of occupied slots}
+    """
+    rooms: Dict[str, int] = {}
+    for lesson in lessons:
+        if not lesson.auditory or not 1 <= lesson.num <= PAIRS:
+            continue
+        week: int = 0 if lesson.week_num == 1 else 1
+        rooms[lesson.auditory] = rooms.get(lesson.auditory, 0) | slot_bit(
+            week, lesson.dow, lesson.num
+        )
+    return rooms
+
+
+class RoomIndex:
+    """
+    In-process index of rooms occupancy. Every room is mapped to a bitset
+    of occupied (week, day, lesson number) slots, so free rooms search
+    is a bitwise AND per room. Index is built on sync and stored in redis,
+    workers reload it when a new version is published.
+    """
+
+    def __init__(self) -> None:
+        self._rooms: Dict[str, int] = {}
+        self.version: int = 0
+        self.loaded: bool = False
+
+    def __contains__(self, room: str) -> bool:
+        return room in self._rooms
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def rooms(self) -> List[str]:
+        """Sorted names of all rooms."""
+        return sorted(self._rooms)
+
+    def free_rooms(self, mask: int) -> List[str]:
+        """
+        Get rooms free in all slots of the mask.
+        :param mask: slots bitset (see slots_mask)
+        :return: sorted names of rooms
+        """
+        return sorted(room for room, busy in self._rooms.items() if not busy & mask)
+
+    def occupied_slots(self, room: str) -> List[Tuple[int, int, int]]:
+        """
+        Get occupied slots of the room.
+        :param room: room name
+        :return: (week, dow, num) tuples; week is 1 or 2
+        """
+        busy = self._rooms.get(room, 0)
+        return [
+            (week + 1, dow, num)
+            for week in range(2)
+            for dow in range(len(DAYS))
+            for num in range(1, PAIRS + 1)
+            if busy & slot_bit(week, dow, num)
+        ]
+
+    async def ensure_loaded(self, redis: Redis) -> None:
+        """Load index from redis if it's not loaded yet (e.g. listener isn't up)."""
+        if not self.loaded:
+            await self.load(
+                redis=redis, version=int(await redis.get(ROOMS_INDEX_VERSION_KEY) or 0)
+            )
+
+    async def load(self, redis: Redis, version: int) -> None:
+        """Load index from redis."""
+        self._rooms = {
+            room.decode(): int(busy)
+            for room, busy in (await redis.hgetall(ROOMS_KEY)).items()
+        }
+        self.version = version
+        self.loaded = True
+        logging.info("Rooms index loaded: %i rooms, version %i", len(self), version)
+
+    async def rebuild(self, redis: Redis, lessons: Iterable[Lesson]) -> Set[str]:
+        """
+        Build index from lessons, save it to redis and notify other workers.
+        :param redis: redis
+        :param lessons: lessons of all groups
+        :return: names of rooms which are no longer used
+        """
+        rooms: Dict[str, int] = occupancy(lessons)
+        previous: Set[str] = {room.decode() for room in await redis.hkeys(ROOMS_KEY)}
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(ROOMS_KEY)
+            if rooms:
+                pipe.hset(ROOMS_KEY, mapping=rooms)
+            pipe.incr(ROOMS_INDEX_VERSION_KEY)
+            version: int = (await pipe.execute())[-1]
+        self._rooms = rooms
+        self.version = version
+        self.loaded = True
+        await redis.publish(ROOMS_INDEX_CHANNEL, version)
+        return previous - rooms.keys()
+
+    async def update(
+        self, redis: Redis, rooms: Iterable[str], lessons: Iterable[Lesson]
+    ) -> Set[str]:
+        """
+        Rebuild index of some rooms, save it to redis and notify other workers.
+        :param redis: redis
+        :param rooms: names of rooms to rebuild
+        :param lessons: lessons held in these rooms (of all groups)
+        :return: names of the rooms which are no longer used
+        """
+        updated: Dict[str, int] = occupancy(lessons)
+        removed: Set[str] = set(rooms) - updated.keys()
+        async with redis.pipeline(transaction=True) as pipe:
+            if removed:
+                pipe.hdel(ROOMS_KEY, *removed)
+            if updated:
+                pipe.hset(ROOMS_KEY, mapping=updated)
+            pipe.incr(ROOMS_INDEX_VERSION_KEY)
+            version: int = (await pipe.execute())[-1]
+        if self.loaded and version == self.version + 1:
+            for room in removed:
+                self._rooms.pop(room, None)
+            self._rooms.update(updated)
+            self.version = version
+        else:
+            # Other versions were published meanwhile, local index can't be patched
+            await self.load(redis=redis, version=version)
+        await redis.publish(ROOMS_INDEX_CHANNEL, version)
+        return removed
+
+    async def listen(self, redis: Redis) -> None:
+        """Keep index up to date with versions published by other workers."""
+
+        async def on_subscribe() -> None:
+            # Catch up on anything published before we subscribed
+            version = int(await redis.get(ROOMS_INDEX_VERSION_KEY) or 0)
+            if not self.loaded or version > self.version:
+                await self.load(redis=redis, version=version)
+
+        async def on_message(data: bytes) -> None:
+            if int(data) > self.version:
+                await self.load(redis=redis, version=int(data))
+
+        await listen_channel(redis, ROOMS_INDEX_CHANNEL, on_subscribe, on_message)
+
+
+room_index = RoomIndex()
@@ -0,0 +1,174 @@
+import datetime
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+import ujson
+
+from app.cache import CacheEntry, unwrap_data
+from app.misc.gen_date import week_index, weeks_dates_table
+from app.misc.timetable import DATE_SLOT
+from db.models import DAYS
+
+MINUTES_IN_DAY = 1440
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class TimetableSlices:
+    """
+    Week-agnostic timetable parsed from the cached body. Lessons of every week
+    are also kept sorted by their start (in minutes from the week start),
+    so current and next lessons are found with bisect.
+    """
+
+    __slots__ = ("weeks", "starts", "ends", "lessons")
+
+    def __init__(self, body: bytes) -> None:
+        # Date placeholders are raw newlines, which json doesn't allow in strings
+        timetable: Dict = ujson.loads(unwrap_data(body).replace(DATE_SLOT, b""))
+        self.weeks: List[List[List[dict]]] = [
+            [day["lessons"] for day in timetable[week]]
+            for week in ("firstWeek", "secondWeek")
+        ]
+        self.starts: List[List[int]] = []
+        self.ends: List[List[int]] = []
+        self.lessons: List[List[dict]] = []
+        for week in self.weeks:
+            slots: List[Tuple[int, int, dict]] = sorted(
+                (
+                    (
+                        dow * MINUTES_IN_DAY + _minutes(lesson["begin"]),
+                        dow * MINUTES_IN_DAY + _minutes(lesson["end"]),
+                        lesson,
+                    )
+                    for dow, lessons in enumerate(week)
+                    for lesson in lessons
+                ),
+                key=lambda slot: slot[0],
+            )
+            self.starts.append([start for start, _, _ in slots])
+            self.ends.append([end for _, end, _ in slots])
+            self.lessons.append([lesson for _, _, lesson in slots])
+
+    def current(self, week: int, minute: int) -> List[dict]:
+        """
+        Get lessons going on at the moment.
+        :param week: 0 for the first week, 1 for the second
+        :param minute: minutes from the week start
+        :return: lessons (several for subgroups) or empty list
+        """
+        starts: List[int] = self.starts[week]
+        end: int = bisect_right(starts, minute)
+        if end == 0:
+            return []
+        begin: int = bisect_left(starts, starts[end - 1])
+        return [
+            self.lessons[week][i]
+            for i in range(begin, end)
+            if self.ends[week][i] > minute
+        ]
+
+    def next(self, week: int, minute: int) -> Tuple[int, int, List[dict]] | None:
+        """
+        Get the nearest lessons starting after the moment.
+        :param week: 0 for the first week, 1 for the second
+        :param minute: minutes from the week start
+        :return: weeks ahead (0 is this week), start in minutes from that week start
+        and lessons; None if there are no lessons at all
+        """
+        for ahead, after in ((0, minute), (1, -1), (2, -1)):
+            starts: List[int] = self.starts[(week + ahead) % 2]
+            begin: int = bisect_right(starts, after)
+            if begin < len(starts):
+                end: int = bisect_right(starts, starts[begin])
+                return ahead, starts[begin], self.lessons[(week + ahead) % 2][begin:end]
+        return None
+
+
+def timetable_slices(entry: CacheEntry) -> TimetableSlices:
+    """Get slices of the cached timetable (built once per entry)."""
+    if entry.derived is None:
+        entry.derived = TimetableSlices(entry.body)
+    return entry.derived
+
+
+def parse_day(value: str) -> datetime.date | None:
+    """
+    Parse requested day.
+    :param value: 'today', 'tomorrow' or date in ISO format (2024-04-22)
+    :return: date or None if it's invalid
+    """
+    today = datetime.date.today()
+    if value == "today":
+        return today
+    if value == "tomorrow":
+        return today + datetime.timedelta(days=1)
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _day(week: int, day: datetime.date, lessons: List[dict]) -> Dict:
+    return {
+        "week": week + 1,
+        "day": DAYS[day.weekday()],
+        "date": day.strftime("%d.%m"),
+        "lessons": lessons,
+    }
+
+
+def day_slice(slices: TimetableSlices, day: datetime.date) -> Dict:
+    """
+    Lessons of the day.
+    :param slices: timetable slices
+    :param day: date
+    :return: week (1 or 2), day name, date and lessons
+    """
+    week: int = week_index(day)
+    return _day(week, day, slices.weeks[week][day.weekday()])
+
+
+def week_slice(slices: TimetableSlices, week: int) -> Dict:
+    """
+    Lessons of the week, with dates like in the full timetable.
+    :param slices: timetable slices
+    :param week: 1 for the first week, 2 for the second
+    :return: week and its days with dates and lessons
+    """
+    dates: Tuple[bytes, ...] = weeks_dates_table()[(week - 1) * 7 : week * 7]
+    return {
+        "week": week,
+        "days": [
+            {"day": day_name, "date": date.decode(), "lessons": lessons}
+            for day_name, date, lessons in zip(DAYS, dates, slices.weeks[week - 1])
+        ],
+    }
+
+
+def now_slice(slices: TimetableSlices, now: datetime.datetime) -> Dict:
+    """
+    Current and next lessons.
+    :param slices: timetable slices
+    :param now: current (local) time
+    :return: current and next lessons with their day (null if there are none)
+    """
+    today: datetime.date = now.date()
+    week: int = week_index(today)
+    minute: int = today.weekday() * MINUTES_IN_DAY + now.hour * 60 + now.minute
+    current: List[dict] = slices.current(week, minute)
+    upcoming = slices.next(week, minute)
+    next_day: Dict | None = None
+    if upcoming is not None:
+        ahead, start, lessons = upcoming
+        day = today + datetime.timedelta(
+            days=7 * ahead + start // MINUTES_IN_DAY - today.weekday()
+        )
+        next_day = _day((week + ahead) % 2, day, lessons)
+    return {
+        "current": _day(week, today, current) if current else None,
+        "next": next_day,
+    }
@@ -0,0 +1,155 @@
+from itertools import chain, cycle
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from app.cache import CacheEntry, cached_response, encode_json, wrap_data
+from app.misc.gen_date import week_start, weeks_dates_table
+from db.models import DAYS, Faculty, Lesson
+from db.repo import Repo, group_weeks
+
+days_dict: Dict[str, int] = {day_name: day_num for day_num, day_name in enumerate(DAYS)}
+# Seconds for which cached entries are fresh. Group timetable doesn't depend
+# on the date, so it lives until the next sync invalidates it.
+GROUP_TTL = 604_800
+TEACHER_TTL = GROUP_TTL
+ROOM_TTL = GROUP_TTL
+FACULTIES_TTL = 10_800
+# Placeholder for the day date in a cached timetable.
+# Serialized json never contains raw newlines, so it can't clash with data.
+DATE_SLOT = b"\n"
+
+
+def empty_weeks() -> List[List[List[dict]]]:
+    """Lessons lists for every day of the first and the second week."""
+    return [[[] for _ in days_dict] for _ in range(2)]
+
+
+def encode_weeks(weeks: List[List[List[dict]]]) -> bytes:
+    """
+    Serialize week-agnostic timetable. Dates are left as DATE_SLOT placeholders,
+    so cached timetable doesn't depend on the current date.
+    :param weeks: lessons of every day of the first and the second week
+    :return: {"firstWeek": [...], "secondWeek": [...]} with date placeholders
+    """
+    first_week, second_week = (
+        b"["
+        + b",".join(
+            b'{"day":'
+            + encode_json(day_name)
+            + b',"date":"'
+            + DATE_SLOT
+            + b'","lessons":'
+            + encode_json(lessons)
+            + b"}"
+            for day_name, lessons in zip(days_dict, week)
+        )
+        + b"]"
+        for week in weeks
+    )
+    return b'{"firstWeek":' + first_week + b',"secondWeek":' + second_week + b"}"
+
+
+def encode_lessons(lessons: Iterable[Lesson]) -> bytes:
+    """
+    Serialize week-agnostic timetable of the group.
+    :param lessons: lessons of the group (with loaded teachers)
+    :return: timetable for the first and second week with date placeholders
+    """
+    return encode_weeks(group_weeks(lessons))
+
+
+def encode_merged_lessons(lessons: Iterable[Lesson]) -> bytes:
+    """
+    Serialize week-agnostic timetable of the teacher or the room. Lesson held
+    for several groups at once is listed once, with all its groups.
+    :param lessons: lessons of the teacher or the room (with loaded teachers
+    and groups), ordered by time
+    :return: timetable for the first and second week with date placeholders
+    """
+    weeks: List[List[List[dict]]] = empty_weeks()
+    merged: Dict[Tuple[Any, ...], dict] = {}
+    for lesson in lessons:
+        week: int = 0 if lesson.week_num == 1 else 1
+        slot = (
+            week,
+            lesson.dow,
+            lesson.num,
+            lesson.name,
+            lesson.type,
+            lesson.auditory,
+            lesson.subgroup,
+            lesson.teacher_id,
+        )
+        if (lesson_dict := merged.get(slot)) is None:
+            lesson_dict = merged[slot] = {**lesson.to_dict(), "groups": []}
+            weeks[week][lesson.dow].append(lesson_dict)
+        lesson_dict["groups"].append({"id": lesson.group.id, "name": lesson.group.name})
+    return encode_weeks(weeks)
+
+
+async def encode_faculties(repo: Repo) -> bytes:
+    """
+    Serialize list of faculties with their groups.
+    :param repo: db repo
+    :return: list of all faculties and their groups
+    """
+    faculties: Sequence[Faculty] = await repo.get_faculties_with_groups()
+    response = [
+        {
+            "id": faculty.id,
+            "name": faculty.name,
+            "groups": [
+                {"id": group.id, "name": group.name} for group in faculty.groups
+            ],
+        }
+        for faculty in faculties
+    ]
+    return encode_json(response)
+
+
+def dates_variant() -> str:
+    """Identifies weeks dates put into timetables (they change once a week)."""
+    return week_start().strftime("%Y%m%d")
+
+
+def timetable_entry(data: bytes, fresh_until: float, fast: bool = False) -> CacheEntry:
+    """
+    Make cache entry of the timetable, precompressed with current weeks dates.
+    :param data: serialized week-agnostic timetable
+    :param fresh_until: time until which entry is fresh
+    :param fast: whether to use fast compression levels (on request path)
+    :return: cache entry
+    """
+    entry = CacheEntry(wrap_data(data, cached=True), fresh_until)
+    entry.precompress(render=render_dates, variant=dates_variant(), fast=fast)
+    return entry
+
+
+def timetable_response(request: Request, entry: CacheEntry) -> Response:
+    """
+    Make timetable response with HTTP caching headers.
+    ETag and Last-Modified account for the weeks dates put into the body.
+    :param request: request
+    :param entry: cache entry with week-agnostic timetable
+    :return: response (304 if client has the same timetable)
+    """
+    return cached_response(
+        request,
+        entry,
+        render=render_dates,
+        variant=dates_variant(),
+        not_before=week_start().timestamp(),
+    )
+
+
+def render_dates(body: bytes) -> bytes:
+    """
+    Put current weeks dates into date placeholders of the timetable
+    (or of several timetables one after another).
+    """
+    parts = body.split(DATE_SLOT)
+    return (
+        b"".join(chain.from_iterable(zip(parts[:-1], cycle(weeks_dates_table()))))
+        + parts[-1]
+    )
@@ -1,15 +1,96 @@
-from typing import AsyncGenerator
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Tuple
 
-from redis import asyncio as aioredis
-from redis.asyncio import Redis
+from fastapi import Request
+from redis.asyncio import BlockingConnectionPool, ConnectionPool, Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
 
-from config_reader import Config, load_config
+from config_reader import Redis as RedisConfig
 
+# Seconds to wait for a pub/sub message at once
+PUBSUB_POLL = 1.0
+# Seconds to wait before listener resubscribes after an error
+LISTENER_RETRY = 5
 
-config: Config = load_config()
 
+def create_redis_pool(config: RedisConfig) -> ConnectionPool:
+    """
+    Function to create redis connection pool shared by the whole app.
+    When all connections are in use, commands wait for a free one
+    (up to config.wait seconds) instead of failing at once.
+    """
+    return BlockingConnectionPool.from_url(
+        config.make_connection_string(),
+        max_connections=config.connections,
+        timeout=config.wait,
+        socket_timeout=config.timeout,
+        socket_connect_timeout=config.timeout,
+        health_check_interval=config.healthcheck,
+    )
 
-async def get_redis() -> AsyncGenerator[Redis, None]:
+
+def get_pool_stats(pool: ConnectionPool) -> Dict[str, int]:
+    """Function to get connection pool statistics."""
+    # redis-py doesn't have public API for this, so we read pool internals
+    # pylint: disable=protected-access
+    in_use: int = len(pool._in_use_connections)
+    idle: int = len(pool._available_connections)
+    return {
+        "max": pool.max_connections,
+        "created": in_use + idle,
+        "in_use": in_use,
+        "idle": idle,
+    }
+
+
+async def pubsub_messages(pubsub: PubSub) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Iterate over messages of the subscribed channels.
+    Unlike pubsub.listen(), it waits with an explicit timeout instead of the pool
+    socket timeout, so an idle channel isn't taken for a broken connection.
+    """
+    while True:
+        message = await pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=PUBSUB_POLL
+        )
+        if message is not None:
+            yield message
+
+
+async def listen_channel(
+    redis: Redis,
+    channel: str,
+    on_subscribe: Callable[[], Awaitable[None]],
+    on_message: Callable[[bytes], Awaitable[None]],
+    errors: Tuple[type[Exception], ...] = (RedisError,),
+) -> None:
+    """
+    Handle messages of the channel forever.
+    On errors (e.g. lost connection) listener resubscribes, and on_subscribe
+    is called after every subscription, so it can catch up on messages
+    published while it wasn't subscribed.
+    :param redis: redis
+    :param channel: channel name
+    :param on_subscribe: called after the channel is subscribed
+    :param on_message: called with data of every message
+    :param errors: errors after which listener resubscribes
+    """
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                await on_subscribe()
+                async for message in pubsub_messages(pubsub):
+                    if message["type"] == "message":
+                        await on_message(message["data"])
+        except errors as e:
+            logging.error("Listener of %s channel error: %s", channel, e)
+            await asyncio.sleep(LISTENER_RETRY)
+
+
+async def get_redis(request: Request) -> AsyncGenerator[Redis, None]:
     """Function to get redis instance"""
-    redis: Redis = aioredis.from_url(config.redis.make_connection_string())
+    redis: Redis = request.app.state.redis
     yield redis
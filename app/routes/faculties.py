@@ -1,50 +1,45 @@
-import json
 import logging
-from typing import Sequence, Dict
+from typing import Dict
 
 from aiohttp import ClientError
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db_session import get_session
+from app.cache import FACULTIES_KEY, cache_fetch, cached_response, invalidate
+from app.db_session import get_session, get_session_factory, in_own_session
 from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from app.jobs import FACULTIES_GROUPS_JOB, enqueue_job
+from app.misc.timetable import FACULTIES_TTL, encode_faculties
 from app.redis_session import get_redis
-from app.utils import update_faculties, update_groups
+from app.utils import update_faculties
 from db.repo import Repo
-from db.models import Faculty
 
 faculty_router = APIRouter()
 
 
 @faculty_router.get("/v0/faculties")
 async def get_faculties_with_groups(
-    repo: Repo = Depends(get_session), redis: Redis = Depends(get_redis)
-) -> Dict:
+    request: Request,
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response:
     """
     Returns list of all faculties with all groups of particular faculty
-    :param repo: db repo
+    :param request: request (for conditional headers)
     :param redis: redis
+    :param session_factory: db session factory (to build list on cache miss)
     :return: list of all faculties and their groups
     """
-    if cached_response := await redis.get(name="faculties"):
-        return {"cached": True, "data": json.loads(cached_response)}
-
-    faculties: Sequence[Faculty] = await repo.get_faculties()
-    response = [
-        {
-            "id": faculty.id,
-            "name": faculty.name,
-            "groups": [
-                {"id": group.id, "name": group.name}
-                for group in await repo.get_groups_of_faculty(faculty_id=faculty.id)
-            ],
-        }
-        for faculty in faculties
-    ]
-
-    await redis.set(name="faculties", value=json.dumps(response), ex=10_800)
-
-    return {"cached": False, "data": response}
+    return cached_response(
+        request,
+        await cache_fetch(
+            redis,
+            FACULTIES_KEY,
+            build=in_own_session(session_factory, encode_faculties),
+            ttl=FACULTIES_TTL,
+        ),
+    )
 
 
 @faculty_router.post("/v0/faculties")
@@ -59,6 +54,7 @@ async def update_faculties_request(
     """
     try:
         await update_faculties(repo=repo, redis=redis)
+        await invalidate(redis, [FACULTIES_KEY])
         return {"message": "Faculties list updated"}
     except JetIQStatusCodeError as e:
         logging.exception("/faculties status error: %s", e)
@@ -71,24 +67,10 @@ async def update_faculties_request(
 
 
 @faculty_router.post("/v0/faculties/groups")
-async def update_faculties_groups(
-    repo: Repo = Depends(get_session), redis: Redis = Depends(get_redis)
-):
+async def update_faculties_groups(redis: Redis = Depends(get_redis)) -> Dict:
     """
-    Updates faculties groups list.
-    :param repo: db repo.
+    Queues update of faculties groups list.
     :param redis: redis instance.
-    :return: message (in case of success) or error (in case of failure)
+    :return: message and job id
     """
-    try:
-        faculties: list[int] = [faculty.id for faculty in await repo.get_faculties()]
-        await update_groups(repo=repo, redis=redis, faculties=faculties)
-        return {"message": "Groups list updated"}
-    except JetIQStatusCodeError as e:
-        logging.exception("/faculties/groups status error: %s", e)
-        return {"error": str(e)}
-    except ClientError as e:
-        logging.exception(
-            "Got client error on post /faculties/groups endpoint. Exception: %s", e
-        )
-        return {"error": "ClientError"}
+    return await enqueue_job(redis, FACULTIES_GROUPS_JOB)
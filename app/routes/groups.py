@@ -1,72 +1,261 @@
-import json
 import logging
-from typing import Sequence, List, Dict
+import time
+from datetime import datetime
+from typing import Dict, List
 
 from aiohttp import ClientError
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Path, Query, Request, Response
 from redis.asyncio import Redis
-from sqlalchemy.exc import IntegrityError
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db_session import get_session
+from app.cache import (
+    CacheEntry,
+    cache_fetch,
+    cache_get_many,
+    cache_set_many,
+    encode_json,
+    group_key,
+    json_response,
+    unwrap_data,
+    wrap_data,
+)
+from app.cache_warmup import invalidate_group
+from app.db_session import get_session, get_session_factory, in_own_session
 from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from app.jobs import GROUPS_LESSONS_JOB, enqueue_job
 from app.redis_session import get_redis
-from app.utils import update_group_lessons, update_groups_lessons, update_teachers
-from app.misc.gen_date import gen_weeks_dates
-from db.repo import Repo
-from db.models import Lesson
+from app.utils import update_group_lessons
+from app.misc.group_index import group_index
+from app.misc.slices import (
+    TimetableSlices,
+    day_slice,
+    now_slice,
+    parse_day,
+    timetable_slices,
+    week_slice,
+)
+from app.misc.timetable import (
+    GROUP_TTL,
+    encode_weeks,
+    render_dates,
+    timetable_entry,
+    timetable_response,
+)
+from db.repo import LessonRecord, Repo, group_weeks
 
 group_router = APIRouter()
-days_dict: Dict[str, int] = {
-    "Пн": 0,
-    "Вт": 1,
-    "Ср": 2,
-    "Чт": 3,
-    "Пт": 4,
-    "Сб": 5,
-    "Нд": 6,
-}
-
-
-@group_router.get("/v0/groups/{group_id}")
+# Max number of groups requested at once
+MAX_BATCH = 100
+
+
+@group_router.get("/v0/groups/{group_id}", response_model=None)
 async def get_group_timetable(
     group_id: int,
+    request: Request,
     repo: Repo = Depends(get_session),
     redis: Redis = Depends(get_redis),
-) -> Dict:
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
     """
     Returns timetable for the given group. First and second week
     :param group_id: id of the group
+    :param request: request (for conditional headers)
     :param repo: db repo
     :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
     :return: timetable for the first and second week or 'group not found' if group is not in db
     """
-    if not await repo.check_group(group_id=group_id):
+    if not await group_index.exists(group_id=group_id, repo=repo):
+        return {"message": "Group not found"}
+    entry: CacheEntry = await fetch_group_timetable(
+        session_factory=session_factory, group_id=group_id, redis=redis
+    )
+    return timetable_response(request, entry)
+
+
+@group_router.get("/v0/groups/{group_id}/day/{day}", response_model=None)
+async def get_group_day(
+    group_id: int,
+    day: str,
+    repo: Repo = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
+    """
+    Returns lessons of the group on the given day
+    :param group_id: id of the group
+    :param day: 'today', 'tomorrow' or date in ISO format (2024-04-22)
+    :param repo: db repo
+    :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
+    :return: week, day name, date and lessons or 'group not found'
+    """
+    if (date := parse_day(day)) is None:
+        return {"error": "day must be 'today', 'tomorrow' or date like 2024-04-22"}
+    if not await group_index.exists(group_id=group_id, repo=repo):
         return {"message": "Group not found"}
+    entry: CacheEntry = await fetch_group_timetable(
+        session_factory=session_factory, group_id=group_id, redis=redis
+    )
+    return json_response(encode_json(day_slice(timetable_slices(entry), date)))
 
-    if cached_response := await redis.get(str(group_id)):
-        return {"cached": True, "data": json.loads(cached_response)}
-
-    lessons: Sequence[Lesson] = await repo.get_group_lessons(group_id=group_id)
-    first_week_dates, second_week_dates = gen_weeks_dates()
-    first_week: List[Dict[str, str | List]] = [
-        {"day": day_name, "date": first_week_dates[day_num], "lessons": []}
-        for day_name, day_num in days_dict.items()
-    ]  # 7 days of the week
-    second_week: List[Dict[str, str | List]] = [
-        {"day": day_name, "date": second_week_dates[day_num], "lessons": []}
-        for day_name, day_num in days_dict.items()
-    ]  # 7 days of the week
-    for lesson in lessons:
-        if lesson.week_num == 1:
-            # sorry mypy, but that's for sure a list
-            first_week[days_dict[lesson.dow]]["lessons"].append(lesson.to_dict())  # type: ignore
+
+@group_router.get("/v0/groups/{group_id}/week/{week}", response_model=None)
+async def get_group_week(
+    group_id: int,
+    week: int = Path(ge=1, le=2),
+    repo: Repo = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
+    """
+    Returns lessons of the group on the first or the second week
+    :param group_id: id of the group
+    :param week: 1 for the first week, 2 for the second
+    :param repo: db repo
+    :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
+    :return: days of the week with dates and lessons or 'group not found'
+    """
+    if not await group_index.exists(group_id=group_id, repo=repo):
+        return {"message": "Group not found"}
+    entry: CacheEntry = await fetch_group_timetable(
+        session_factory=session_factory, group_id=group_id, redis=redis
+    )
+    return json_response(encode_json(week_slice(timetable_slices(entry), week)))
+
+
+@group_router.get("/v0/groups/{group_id}/now", response_model=None)
+async def get_group_now(
+    group_id: int,
+    repo: Repo = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
+    """
+    Returns current and next lessons of the group
+    :param group_id: id of the group
+    :param repo: db repo
+    :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
+    :return: current and next lessons with their days or 'group not found'
+    """
+    if not await group_index.exists(group_id=group_id, repo=repo):
+        return {"message": "Group not found"}
+    entry: CacheEntry = await fetch_group_timetable(
+        session_factory=session_factory, group_id=group_id, redis=redis
+    )
+    slices: TimetableSlices = timetable_slices(entry)
+    return json_response(encode_json(now_slice(slices, datetime.now())))
+
+
+@group_router.get("/v0/groups", response_model=None)
+async def get_groups_timetables(
+    ids: str = Query(description="Comma separated ids of groups"),
+    repo: Repo = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+) -> Response | Dict:
+    """
+    Returns timetables for the given groups. Cached timetables are fetched
+    in one round trip, and missing ones are built from one db query.
+    :param ids: comma separated ids of groups (at most MAX_BATCH)
+    :param repo: db repo
+    :param redis: redis
+    :return: id, status (hit, miss or not_found) and timetable of every group
+    """
+    try:
+        groups_ids: List[int] = list(
+            dict.fromkeys(int(group_id) for group_id in ids.split(",") if group_id)
+        )
+    except ValueError:
+        return {"error": "ids must be comma separated integers"}
+    if not groups_ids or len(groups_ids) > MAX_BATCH:
+        return {"error": f"From 1 to {MAX_BATCH} groups can be requested at once"}
+
+    existing: List[int] = [
+        group_id
+        for group_id in groups_ids
+        if await group_index.exists(group_id=group_id, repo=repo)
+    ]
+    hits: Dict[str, CacheEntry] = await cache_get_many(redis, map(group_key, existing))
+    misses: List[int] = [
+        group_id for group_id in existing if group_key(group_id) not in hits
+    ]
+    built: Dict[int, bytes] = {}
+    if misses:
+        records: Dict[int, List[LessonRecord]] = await repo.get_groups_lesson_records(
+            misses
+        )
+        built = {
+            group_id: encode_weeks(group_weeks(group_records))
+            for group_id, group_records in records.items()
+        }
+        fresh_until: float = time.time() + GROUP_TTL
+        await cache_set_many(
+            redis,
+            (
+                (group_key(group_id), timetable_entry(data, fresh_until, fast=True))
+                for group_id, data in built.items()
+            ),
+        )
+
+    items: List[bytes] = []
+    for group_id in groups_ids:
+        if (entry := hits.get(group_key(group_id))) is not None:
+            status, data = b"hit", unwrap_data(entry.body)
+        elif group_id in built:
+            status, data = b"miss", built[group_id]
         else:
-            second_week[days_dict[lesson.dow]]["lessons"].append(lesson.to_dict())  # type: ignore
+            status, data = b"not_found", b"null"
+        items.append(b'{"id":%d,"status":"%s","data":%s}' % (group_id, status, data))
+    return json_response(render_dates(b'{"groups":[' + b",".join(items) + b"]}"))
+
+
+async def fetch_group_timetable(
+    session_factory: async_sessionmaker[AsyncSession], group_id: int, redis: Redis
+) -> CacheEntry:
+    """
+    Get cached timetable of the group, building it if it's missing.
+    If cache is unavailable, timetable is built without it.
+    :param session_factory: db session factory
+    :param group_id: id of the group
+    :param redis: redis
+    :return: cache entry with week-agnostic timetable
+    """
+    try:
+        return await cache_fetch(
+            redis,
+            group_key(group_id),
+            build=in_own_session(
+                session_factory, lambda repo: build_group_timetable(repo, group_id)
+            ),
+            ttl=GROUP_TTL,
+            make_entry=timetable_entry,
+        )
+    except RedisError as e:
+        # Snapshot makes the build a single row read, so it's served without cache
+        logging.error("Cache is unavailable for group %i: %s", group_id, e)
+        data: bytes = await in_own_session(
+            session_factory, lambda repo: build_group_timetable(repo, group_id)
+        )()
+        return CacheEntry(wrap_data(data, cached=False), 0)
 
-    response = {"firstWeek": first_week, "secondWeek": second_week}
-    await redis.set(str(group_id), json.dumps(response), ex=10_800)
 
-    return {"cached": False, "data": response}
+async def build_group_timetable(repo: Repo, group_id: int) -> bytes:
+    """
+    Build serialized timetable of the group from db.
+    It's read from the timetable snapshot, lessons are used only if there's none
+    or it may be stale (see Repo.get_group_timetable).
+    :param repo: db repo
+    :param group_id: id of the group
+    :return: timetable for the first and second week with date placeholders
+    """
+    weeks = await repo.get_group_timetable(group_id=group_id)
+    if weeks is None:
+        records = await repo.get_groups_lesson_records([group_id])
+        weeks = group_weeks(records[group_id])
+    return encode_weeks(weeks)
 
 
 @group_router.post("/v0/groups/{group_id}")
@@ -82,11 +271,11 @@ async def update_group_timetable(
     :param redis: redis
     :return: message or error
     """
-    if not await repo.check_group(group_id=group_id):
+    if not await group_index.exists(group_id=group_id, repo=repo):
         return {"message": "Group not found"}
     try:
         await update_group_lessons(group_id=group_id, repo=repo)
-        await redis.delete(str(group_id))
+        await invalidate_group(repo=repo, redis=redis, group_id=group_id)
         return {"message": "Group lessons updated"}
     except JetIQStatusCodeError as e:
         logging.exception("/groups with group id: %i; status error: %s", group_id, e)
@@ -101,36 +290,10 @@ async def update_group_timetable(
 
 
 @group_router.post("/v0/groups")
-async def update_groups_request(
-    repo: Repo = Depends(get_session), redis: Redis = Depends(get_redis)
-) -> Dict:
+async def update_groups_request(redis: Redis = Depends(get_redis)) -> Dict:
     """
-    Updates timetable for all groups
-    :param repo: db repo
+    Queues update of timetable for all groups
     :param redis: redis
-    :return: message or error
+    :return: message and job id
     """
-    try:
-        if await redis.get("update_all_groups"):
-            return {
-                "message": f"Groups already updated. Timout: {await redis.ttl('update_all_groups')}"
-            }
-        await redis.set("update_all_groups", 1, ex=3600)
-        groups_ids: list[int] = [group.id for group in await repo.get_groups()]
-        try:
-            await update_groups_lessons(repo=repo, redis=redis, groups_ids=groups_ids)
-        except IntegrityError:
-            logging.info(
-                "Error while updating groups lessons table. Problem with teachers"
-            )
-            await update_teachers(repo=repo)
-            logging.info("Updated teachers")
-            await update_groups_lessons(repo=repo, redis=redis, groups_ids=groups_ids)
-            logging.info("Updated groups lessons")
-        return {"message": "Groups updated"}
-    except JetIQStatusCodeError as e:
-        logging.exception("/groups status error: %s", e)
-        return {"error": str(e)}
-    except ClientError as e:
-        logging.exception("Got client error on post /groups endpoint. Exception: %s", e)
-        return {"error": "ClientError"}
+    return await enqueue_job(redis, GROUPS_LESSONS_JOB)
@@ -0,0 +1,22 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
+
+from app.jobs import JobQueue
+from app.redis_session import get_redis
+
+jobs_router = APIRouter()
+
+
+@jobs_router.get("/v0/jobs/{job_id}")
+async def get_job(job_id: str, redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Returns status of the job queued by POST route
+    :param job_id: job id
+    :param redis: redis
+    :return: job status, timestamps and result; sync progress while groups are updated
+    """
+    if (job := await JobQueue(redis=redis).get(job_id)) is None:
+        return {"message": "Job not found"}
+    return job
@@ -0,0 +1,114 @@
+from typing import Dict, Sequence
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import CacheEntry, cache_fetch, room_key
+from app.db_session import get_session_factory, in_own_session
+from app.misc.room_index import PAIRS, room_index, slots_mask
+from app.misc.timetable import (
+    ROOM_TTL,
+    encode_merged_lessons,
+    timetable_entry,
+    timetable_response,
+)
+from app.redis_session import get_redis
+from db.models import DAYS, Lesson
+from db.repo import Repo
+
+rooms_router = APIRouter()
+
+
+@rooms_router.get("/v0/rooms")
+async def get_rooms(redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Returns list of all rooms
+    :param redis: redis
+    :return: sorted names of rooms
+    """
+    await room_index.ensure_loaded(redis)
+    return {"rooms": room_index.rooms()}
+
+
+@rooms_router.get("/v0/rooms/free")
+async def get_free_rooms(
+    week: int = Query(ge=1, le=2),
+    dow: int = Query(ge=0, lt=len(DAYS)),
+    num: int = Query(ge=1, le=PAIRS),
+    num_to: int | None = Query(default=None, ge=1, le=PAIRS),
+    redis: Redis = Depends(get_redis),
+) -> Dict:
+    """
+    Returns rooms free at the given lesson (or in all lessons from num to num_to)
+    :param week: 1 for the first week, 2 for the second
+    :param dow: day of the week (0 is Monday)
+    :param num: number of the lesson
+    :param num_to: number of the last lesson of the range (inclusive)
+    :param redis: redis
+    :return: sorted names of free rooms
+    """
+    if num_to is not None and num_to < num:
+        return {"error": "num_to must not be less than num"}
+    await room_index.ensure_loaded(redis)
+    mask: int = slots_mask(week - 1, dow, num, num if num_to is None else num_to)
+    return {"rooms": room_index.free_rooms(mask)}
+
+
+# Room names can contain "/" (e.g. "2/101"), so they are matched as paths.
+# Routes with a suffix go first, otherwise the room would swallow the suffix.
+@rooms_router.get("/v0/rooms/{room:path}/slots")
+async def get_room_slots(room: str, redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Returns occupied slots of the room
+    :param room: room name
+    :param redis: redis
+    :return: [week, dow, num] lists or 'room not found'
+    """
+    await room_index.ensure_loaded(redis)
+    if room not in room_index:
+        return {"message": "Room not found"}
+    return {"slots": room_index.occupied_slots(room)}
+
+
+@rooms_router.get("/v0/rooms/{room:path}", response_model=None)
+async def get_room_timetable(
+    room: str,
+    request: Request,
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
+    """
+    Returns timetable for the given room, with groups of every lesson.
+    First and second week
+    :param room: room name
+    :param request: request (for conditional headers)
+    :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
+    :return: timetable for the first and second week or 'room not found'
+    """
+    await room_index.ensure_loaded(redis)
+    if room not in room_index:
+        return {"message": "Room not found"}
+
+    entry: CacheEntry = await cache_fetch(
+        redis,
+        room_key(room),
+        build=in_own_session(
+            session_factory, lambda repo: build_room_timetable(repo, room)
+        ),
+        ttl=ROOM_TTL,
+        make_entry=timetable_entry,
+    )
+    return timetable_response(request, entry)
+
+
+async def build_room_timetable(repo: Repo, room: str) -> bytes:
+    """
+    Build serialized timetable of the room from db (only if it's evicted from cache).
+    :param repo: db repo
+    :param room: room name
+    :return: timetable for the first and second week with date placeholders
+    """
+    lessons: Sequence[Lesson] = await repo.get_rooms_lessons([room])
+    return encode_merged_lessons(lessons)
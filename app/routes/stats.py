@@ -0,0 +1,66 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends, Request
+from redis.asyncio import Redis
+
+from app.cache import local_cache
+from app.cache_warmup import SYNC_STATS_KEY, WARMUP_STATS_KEY
+from app.db_session import get_db_pool_stats
+from app.ingest import SyncProgress
+from app.redis_session import get_pool_stats, get_redis
+
+stats_router = APIRouter()
+
+
+@stats_router.get("/v0/stats/redis")
+async def get_redis_stats(request: Request) -> Dict:
+    """
+    Returns redis connection pool statistics
+    :param request: request (to get app state)
+    :return: max, created, in use and idle connections count
+    """
+    return {"pool": get_pool_stats(request.app.state.redis_pool)}
+
+
+@stats_router.get("/v0/stats/db")
+async def get_db_stats(request: Request) -> Dict:
+    """
+    Returns db connection pool statistics of the worker
+    :param request: request (to get app state)
+    :return: max, in use and idle connections count, utilization
+    and connection checkout wait times
+    """
+    return {"pool": get_db_pool_stats(request.app.state.engine)}
+
+
+@stats_router.get("/v0/stats/cache")
+async def get_cache_stats(redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Returns in-memory cache statistics of the worker and last cache warmup report
+    :param redis: redis
+    :return: size, hits, misses and evictions count; warmed keys, seconds and bytes
+    """
+    return {
+        "local": local_cache.stats(),
+        "warmup": {
+            key.decode(): float(value)
+            for key, value in (await redis.hgetall(WARMUP_STATS_KEY)).items()
+        },
+    }
+
+
+@stats_router.get("/v0/stats/sync")
+async def get_sync_stats(redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Returns progress of the current (or last) groups lessons sync run
+    and statistics of the last finished sync
+    :param redis: redis
+    :return: run status with done/pending/failed groups; changed and unchanged groups count
+    """
+    return {
+        "run": await SyncProgress(redis=redis).status(),
+        "last": {
+            key.decode(): int(value)
+            for key, value in (await redis.hgetall(SYNC_STATS_KEY)).items()
+        },
+    }
@@ -1,32 +1,80 @@
-import logging
-from typing import Dict
+from typing import Dict, Sequence
 
-from aiohttp import ClientError
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db_session import get_session
-from app.exceptions.jet_status_exception import JetIQStatusCodeError
-from app.utils import update_teachers
+from app.cache import CacheEntry, cache_fetch, cache_get, teacher_key
+from app.db_session import get_session, get_session_factory, in_own_session
+from app.jobs import TEACHERS_JOB, enqueue_job
+from app.misc.timetable import (
+    TEACHER_TTL,
+    encode_merged_lessons,
+    timetable_entry,
+    timetable_response,
+)
+from app.redis_session import get_redis
+from db.models import Lesson
 from db.repo import Repo
 
 teachers_router = APIRouter()
 
 
-@teachers_router.post("/v0/teachers")
-async def update_teachers_request(repo: Repo = Depends(get_session)) -> Dict:
+@teachers_router.get("/v0/teachers/{teacher_id}", response_model=None)
+async def get_teacher_timetable(
+    teacher_id: int,
+    request: Request,
+    repo: Repo = Depends(get_session),
+    redis: Redis = Depends(get_redis),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_session_factory),
+) -> Response | Dict:
+    """
+    Returns timetable for the given teacher, with groups of every lesson.
+    First and second week
+    :param teacher_id: id of the teacher
+    :param request: request (for conditional headers)
+    :param repo: db repo
+    :param redis: redis
+    :param session_factory: db session factory (to build timetable on cache miss)
+    :return: timetable for the first and second week or 'teacher not found'
+    if teacher is not in db
+    """
+    key: str = teacher_key(teacher_id)
+    # Timetables are warmed on sync, so db is queried only on cache miss
+    if (
+        await cache_get(redis, key) is None
+        and await repo.get_teacher_by_id(teacher_id=teacher_id) is None
+    ):
+        return {"message": "Teacher not found"}
+
+    entry: CacheEntry = await cache_fetch(
+        redis,
+        key,
+        build=in_own_session(
+            session_factory, lambda repo: build_teacher_timetable(repo, teacher_id)
+        ),
+        ttl=TEACHER_TTL,
+        make_entry=timetable_entry,
+    )
+    return timetable_response(request, entry)
+
+
+async def build_teacher_timetable(repo: Repo, teacher_id: int) -> bytes:
     """
-    Updates all teachers.
+    Build serialized timetable of the teacher from db.
     :param repo: db repo
-    :return: message (on success) or error (on failure)
+    :param teacher_id: id of the teacher
+    :return: timetable for the first and second week with date placeholders
+    """
+    lessons: Sequence[Lesson] = await repo.get_teachers_lessons([teacher_id])
+    return encode_merged_lessons(lessons)
+
+
+@teachers_router.post("/v0/teachers")
+async def update_teachers_request(redis: Redis = Depends(get_redis)) -> Dict:
+    """
+    Queues update of all teachers.
+    :param redis: redis
+    :return: message and job id
     """
-    try:
-        await update_teachers(repo=repo)
-        return {"message": "Teachers updated"}
-    except JetIQStatusCodeError as e:
-        logging.exception("/teachers status error: %s", e)
-        return {"error": str(e)}
-    except ClientError as e:
-        logging.exception(
-            "Got client error on post /teachers endpoint. Exception: %s", e
-        )
-        return {"error": "ClientError"}
+    return await enqueue_job(redis, TEACHERS_JOB)
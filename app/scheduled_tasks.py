@@ -3,15 +3,19 @@ import logging
 from aiohttp import ClientError
 from apscheduler.job import Job  # type: ignore
 from redis.asyncio import Redis
-from sqlalchemy.exc import IntegrityError
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
+from app.cache import FACULTIES_KEY, invalidate, settings
+from app.cache_warmup import refresh_rooms, warm_cache
 from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from app.ingest import SyncProgress
+from app.jobs import GROUPS_LESSONS_JOB, enqueue_job
+from app.leader import LeaderLease
+from app.misc.group_index import group_index
 from app.utils import (
     update_faculties,
     update_groups,
-    update_teachers,
-    update_groups_lessons,
 )
 from db.repo import Repo
 
@@ -24,6 +28,7 @@ async def update_faculties_table(
         async with session_factory() as session:
             repo: Repo = Repo(session=session)
             await update_faculties(repo=repo, redis=redis)
+            await invalidate(redis, [FACULTIES_KEY])
         retry_task.pause()
     except JetIQStatusCodeError as e:
         logging.exception("Error while updating faculties table. Exception: %s", e)
@@ -34,9 +39,15 @@ async def update_faculties_table(
 
 
 async def update_groups_table(
-    session_factory: async_sessionmaker[AsyncSession], redis: Redis, retry_task: Job
+    session_factory: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    retry_task: Job,
+    lease: LeaderLease,
 ) -> None:
-    """Task to update groups table."""
+    """
+    Task to update groups table.
+    Groups index isn't rebuilt if the leader lease was lost meanwhile.
+    """
     try:
         async with session_factory() as session:
             repo: Repo = Repo(session=session)
@@ -44,6 +55,9 @@ async def update_groups_table(
                 faculty.id for faculty in await repo.get_faculties()
             ]
             await update_groups(repo=repo, redis=redis, faculties=faculties)
+            await lease.check()
+            await group_index.rebuild(repo=repo, redis=redis)
+            await invalidate(redis, [FACULTIES_KEY])
         retry_task.pause()
     except JetIQStatusCodeError as e:
         logging.exception("Error while updating groups table. Exception: %s", e)
@@ -56,6 +70,26 @@ async def update_groups_table(
         retry_task.resume()
 
 
+async def rewarm_cache(
+    session_factory: async_sessionmaker[AsyncSession], redis: Redis, lease: LeaderLease
+) -> None:
+    """
+    Task to warm cache at the start of the week,
+    so precompressed timetables have the new weeks dates.
+    Rooms aren't warmed if the leader lease was lost meanwhile.
+    """
+    if not settings.warmup:
+        return
+    try:
+        async with session_factory() as session:
+            repo: Repo = Repo(session=session)
+            await warm_cache(repo=repo, redis=redis)
+            await lease.check()
+            await refresh_rooms(repo=repo, redis=redis)
+    except RedisError as e:
+        logging.error("Got redis error while warming cache: %s", e)
+
+
 # async def update_teachers_table(
 #     session_factory: async_sessionmaker[AsyncSession], retry_task: Job
 # ) -> None:
@@ -70,31 +104,26 @@ async def update_groups_table(
 #         retry_task.resume()
 
 
-async def update_groups_lessons_table(
-    session_factory: async_sessionmaker[AsyncSession], redis: Redis, retry_task: Job
-) -> None:
-    """Task to update groups lessons table."""
+async def update_groups_lessons_table(redis: Redis) -> None:
+    """
+    Task to update groups lessons table. The sync is queued for the worker
+    (app.worker), so it doesn't run twice if it's already queued or running.
+    """
     try:
-        async with session_factory() as session:
-            repo: Repo = Repo(session=session)
-            groups_ids: list[int] = [group.id for group in await repo.get_groups()]
-            await update_groups_lessons(repo=repo, redis=redis, groups_ids=groups_ids)
-        retry_task.pause()
-    except IntegrityError:
-        logging.info("Error while updating groups lessons table. Problem with teachers")
-        await update_teachers(repo=repo)
-        logging.info("Updated teachers")
-        await update_groups_lessons(repo=repo, redis=redis, groups_ids=groups_ids)
-        logging.info("Updated groups lessons")
-    except JetIQStatusCodeError as e:
-        logging.exception(
-            "Error while updating groups lessons table. Problem NOT with teachers. Exception: %s",
-            e,
-        )
-        retry_task.resume()
-    except ClientError as e:
-        logging.error(
-            "Got client error while getting group schedule; error - %s",
-            e,
-        )
-        retry_task.resume()
+        result = await enqueue_job(redis, GROUPS_LESSONS_JOB)
+        logging.info("Groups lessons sync: %s", result["message"])
+    except RedisError as e:
+        logging.error("Got redis error while queueing groups lessons sync: %s", e)
+
+
+async def resume_groups_lessons_sync(redis: Redis) -> None:
+    """
+    Retry task to resume failed (or interrupted) groups lessons sync,
+    so only failed and pending groups are synced.
+    """
+    try:
+        if await SyncProgress(redis=redis).unfinished():
+            result = await enqueue_job(redis, GROUPS_LESSONS_JOB, {"resume": True})
+            logging.info("Resuming groups lessons sync: %s", result["message"])
+    except RedisError as e:
+        logging.error("Got redis error while resuming groups lessons sync: %s", e)
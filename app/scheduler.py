@@ -0,0 +1,170 @@
+import asyncio
+import functools
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from apscheduler.job import Job  # type: ignore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.exceptions.leader_exception import NotLeaderError
+from app.leader import LeaderLease
+from app.scheduled_tasks import (
+    resume_groups_lessons_sync,
+    rewarm_cache,
+    update_faculties_table,
+    update_groups_table,
+    update_groups_lessons_table,
+)
+
+
+def fenced(
+    task: Callable[..., Awaitable[None]], lease: LeaderLease
+) -> Callable[..., Awaitable[None]]:
+    """
+    Wrap task, so it's skipped if this worker is no longer the leader.
+    Long tasks check the lease between their steps too (LeaderLease.check),
+    and are stopped if it's lost.
+    """
+
+    @functools.wraps(task)
+    async def wrapper(**kwargs: Any) -> None:
+        if not await lease.validate():
+            logging.warning("Skipping %s: not the leader anymore", task.__name__)
+            return
+        try:
+            await task(**kwargs)
+        except NotLeaderError as e:
+            logging.warning("Stopped %s: %s", task.__name__, e)
+
+    return wrapper
+
+
+def create_scheduler(
+    session_factory: async_sessionmaker[AsyncSession], redis: Redis, lease: LeaderLease
+) -> AsyncIOScheduler:
+    """Create and start scheduler with all scheduled (and retry) tasks."""
+    scheduler = AsyncIOScheduler(timezone="Europe/Kyiv")
+    scheduler.start()
+
+    retry_faculties: Job = scheduler.add_job(
+        fenced(update_faculties_table, lease),
+        trigger="interval",
+        minutes=10,
+        start_date=datetime.now(),
+        kwargs={
+            "session_factory": session_factory,
+            "redis": redis,
+            "retry_task": None,
+        },
+    )
+    retry_faculties.kwargs["retry_task"] = retry_faculties
+    retry_faculties.pause()
+
+    retry_groups: Job = scheduler.add_job(
+        fenced(update_groups_table, lease),
+        trigger="interval",
+        minutes=10,
+        start_date=datetime.now(),
+        kwargs={
+            "session_factory": session_factory,
+            "redis": redis,
+            "retry_task": None,
+            "lease": lease,
+        },
+    )
+    retry_groups.kwargs["retry_task"] = retry_groups
+    retry_groups.pause()
+
+    # retry_teachers: Job = ...
+    # retry_teachers.kwargs["retry_task"] = retry_teachers
+    # retry_teachers.pause()
+
+    # Not paused: the sync runs in the worker, so its failures are found
+    # by the sync progress in redis (the task does nothing if there are none)
+    scheduler.add_job(
+        fenced(resume_groups_lessons_sync, lease),
+        trigger="interval",
+        minutes=10,
+        start_date=datetime.now(),
+        kwargs={"redis": redis},
+    )
+
+    # Main tasks
+
+    scheduler.add_job(
+        fenced(update_faculties_table, lease),
+        trigger="cron",
+        day=1,
+        start_date=datetime.now(),
+        kwargs={
+            "session_factory": session_factory,
+            "redis": redis,
+            "retry_task": retry_faculties,
+        },
+    )
+    scheduler.add_job(
+        fenced(update_groups_table, lease),
+        trigger="cron",
+        day=1,
+        hour=1,
+        start_date=datetime.now(),
+        kwargs={
+            "session_factory": session_factory,
+            "redis": redis,
+            "retry_task": retry_groups,
+            "lease": lease,
+        },
+    )
+    # Because by updating groups lessons table we also update teachers table
+    # so, we don't really need this scheduled job
+    # scheduler.add_job(
+    #     update_teachers_table, trigger='cron', hour=3, minute=0, start_date=datetime.now(),
+    #     kwargs={"session_factory": sa_sessionmaker(config.postgres),
+    #     "retry_task": retry_teachers},
+    # )
+    scheduler.add_job(
+        fenced(update_groups_lessons_table, lease),
+        trigger="cron",
+        hour=7,
+        start_date=datetime.now(),
+        kwargs={"redis": redis},
+    )
+    # Monday 3:00 is already Monday in UTC too, so new weeks dates are used
+    scheduler.add_job(
+        fenced(rewarm_cache, lease),
+        trigger="cron",
+        day_of_week="mon",
+        hour=3,
+        start_date=datetime.now(),
+        kwargs={"session_factory": session_factory, "redis": redis, "lease": lease},
+    )
+    return scheduler
+
+
+async def run_scheduler(
+    session_factory: async_sessionmaker[AsyncSession], redis: Redis, lease: LeaderLease
+) -> None:
+    """
+    Run scheduled tasks only while this worker holds the leader lease,
+    so only one worker runs them. If the leader dies, another worker takes
+    the lease after it expires. Meant to be run as a background task.
+    """
+    scheduler: AsyncIOScheduler | None = None
+    try:
+        while True:
+            if await lease.keep():
+                if scheduler is None:
+                    scheduler = create_scheduler(session_factory, redis, lease)
+                    logging.info("Scheduler started")
+            elif scheduler is not None:
+                scheduler.shutdown(wait=False)
+                scheduler = None
+                logging.info("Scheduler stopped")
+            await asyncio.sleep(lease.lease / 3)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+        await lease.release()
@@ -0,0 +1,139 @@
+"""
+Sync worker. Runs jobs queued by the POST routes:
+    python -m app.worker
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiohttp import ClientError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.cache import FACULTIES_KEY, configure_cache, invalidate
+from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from app.ingest import configure_sync, sync_all_groups_lessons
+from app.jobs import FACULTIES_GROUPS_JOB, GROUPS_LESSONS_JOB, TEACHERS_JOB, JobQueue
+from app.logging_cfg import InterceptHandler
+from app.misc.group_index import group_index
+from app.redis_session import create_redis_pool
+from app.utils import update_groups, update_teachers
+from config_reader import Config, load_config
+from db.db import create_engine, sa_sessionmaker
+from db.repo import Repo
+
+# Called with session factory, redis and job params
+Handler = Callable[..., Awaitable[Dict]]
+
+
+async def update_all_groups_lessons(
+    session_factory: async_sessionmaker[AsyncSession],
+    redis: Redis,
+    resume: bool = False,
+) -> Dict:
+    """
+    Job to update timetable for all groups.
+    Resumed job syncs only failed and pending groups of the unfinished run.
+    """
+    await sync_all_groups_lessons(
+        session_factory=session_factory, redis=redis, resume=resume
+    )
+    return {"message": "Groups updated"}
+
+
+async def update_faculties_groups(
+    session_factory: async_sessionmaker[AsyncSession], redis: Redis
+) -> Dict:
+    """Job to update groups list of every faculty."""
+    async with session_factory() as session:
+        repo: Repo = Repo(session=session)
+        faculties: list[int] = [faculty.id for faculty in await repo.get_faculties()]
+        await update_groups(repo=repo, redis=redis, faculties=faculties)
+        await group_index.rebuild(repo=repo, redis=redis)
+        await invalidate(redis, [FACULTIES_KEY])
+    return {"message": "Groups list updated"}
+
+
+async def update_all_teachers(
+    session_factory: async_sessionmaker[AsyncSession], _redis: Redis
+) -> Dict:
+    """Job to update all teachers."""
+    async with session_factory() as session:
+        await update_teachers(repo=Repo(session=session))
+    return {"message": "Teachers updated"}
+
+
+handlers: Dict[str, Handler] = {
+    GROUPS_LESSONS_JOB: update_all_groups_lessons,
+    FACULTIES_GROUPS_JOB: update_faculties_groups,
+    TEACHERS_JOB: update_all_teachers,
+}
+
+
+async def run_job(
+    job: Dict[str, Any],
+    queue: JobQueue,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Run job and save its result (message or error).
+    :param job: job
+    :param queue: job queue
+    :param session_factory: db session factory
+    """
+    logging.info("Started job %s (%s)", job["id"], job["kind"])
+    await queue.start(job["id"])
+    result: Dict[str, Any]
+    try:
+        result = await handlers[job["kind"]](
+            session_factory, queue.redis, **job.get("params", {})
+        )
+    except JetIQStatusCodeError as e:
+        logging.exception("Job %s status error: %s", job["kind"], e)
+        result = {"error": str(e)}
+    except ClientError as e:
+        logging.exception("Got client error in job %s. Exception: %s", job["kind"], e)
+        result = {"error": "ClientError"}
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logging.exception("Job %s failed: %s", job["kind"], e)
+        result = {"error": repr(e)}
+    await queue.finish(job, result)
+    logging.info("Finished job %s (%s)", job["id"], job["kind"])
+
+
+async def work(session_factory: async_sessionmaker[AsyncSession], redis: Redis) -> None:
+    """Take jobs from the queue and run them one by one."""
+    queue = JobQueue(redis=redis)
+    while True:
+        try:
+            if (job := await queue.next()) is not None:
+                await run_job(job=job, queue=queue, session_factory=session_factory)
+        except RedisError as e:
+            logging.error("Job queue error: %s", e)
+            await asyncio.sleep(5)
+
+
+async def main() -> None:
+    """Worker entry point."""
+    config: Config = load_config()
+    engine = create_engine(config.postgres)
+    session_maker = sa_sessionmaker(engine)
+    redis_pool = create_redis_pool(config.redis)
+    redis: Redis = Redis(connection_pool=redis_pool)
+    configure_cache(config.cache)
+    configure_sync(config.jetiq)
+    logging.info("Worker started!")
+    try:
+        await work(session_factory=session_maker, redis=redis)
+    finally:
+        await redis.aclose()
+        await redis_pool.disconnect()
+        await engine.dispose()
+        logging.info("Worker stopped!")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Compare requests per second of a worker serving cached json as a dict
+(decoded and serialized again by FastAPI, as before) with serving
+the cached bytes as they are (app.cache.json_response):
+    python -m benchmarks.cached_responses
+Requests are sent straight to the ASGI app, so numbers don't include
+network and redis round trips (they are the same for both paths).
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Response
+
+from app.cache import encode_json, json_response, wrap_data
+
+SECONDS = 2.0
+FACULTIES = 15
+GROUPS = 60
+
+
+def faculties_document() -> List[Dict[str, Any]]:
+    """Faculties list of about the real size."""
+    return [
+        {
+            "id": faculty_id,
+            "name": f"Факультет {faculty_id}",
+            "groups": [
+                {"id": faculty_id * 1000 + i, "name": f"{i}КН-{faculty_id}б"}
+                for i in range(GROUPS)
+            ],
+        }
+        for faculty_id in range(FACULTIES)
+    ]
+
+
+def timetable_document() -> Dict[str, Any]:
+    """Two weeks group timetable of about the real size."""
+    lesson = {
+        "num": 1,
+        "auditory": "2/101",
+        "type": "Лк",
+        "subgroup": 0,
+        "name": "Вища математика",
+        "teacher": {"id": 1, "name": "Іваненко Іван Іванович"},
+        "begin": "08:30",
+        "end": "09:50",
+        "added_at": "22/04/2024, 03:00:00",
+    }
+    week = [
+        {"day": day, "date": "22.04", "lessons": [lesson] * 4}
+        for day in ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Нд")
+    ]
+    return {"firstWeek": week, "secondWeek": week}
+
+
+def add_routes(app: FastAPI, name: str, data: bytes) -> None:
+    """Add both paths for the payload."""
+    # Before: cached json string is decoded and serialized again by FastAPI
+    cached_json: str = json.dumps(json.loads(data))
+    # After: final response body is cached and sent as is
+    cached_body: bytes = wrap_data(data, cached=True)
+
+    @app.get(f"/dict/{name}")
+    async def as_dict() -> Dict:
+        return {"cached": True, "data": json.loads(cached_json)}
+
+    @app.get(f"/bytes/{name}")
+    async def as_bytes() -> Response:
+        return json_response(cached_body)
+
+
+async def request(app: FastAPI, path: str) -> bytes:
+    """Send GET request to ASGI app and return response body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    body: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure(app: FastAPI, path: str) -> float:
+    """Requests per second of one worker (requests are sent one by one)."""
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < SECONDS:
+        await request(app, path)
+        count += 1
+    return count / elapsed
+
+
+async def main() -> None:
+    """Benchmark entry point."""
+    payloads: Dict[str, bytes] = {
+        "faculties": encode_json(faculties_document()),
+        "timetable": encode_json(timetable_document()),
+    }
+    app = FastAPI()
+    for name, data in payloads.items():
+        add_routes(app, name, data)
+    print(
+        f"{'document':>10} {'KiB':>6} {'dict, rps':>10} {'bytes, rps':>11} {'speedup':>8}"
+    )
+    for name, data in payloads.items():
+        assert json.loads(await request(app, f"/dict/{name}")) == json.loads(
+            await request(app, f"/bytes/{name}")
+        )
+        before = await measure(app, f"/dict/{name}")
+        after = await measure(app, f"/bytes/{name}")
+        print(
+            f"{name:>10} {len(data) / 1024:>6.1f} {before:>10.0f} {after:>11.0f}"
+            f" {after / before:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
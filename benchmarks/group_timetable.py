@@ -0,0 +1,116 @@
+"""
+Compare building group timetable from ORM lessons (Lesson.to_dict)
+with building it from lesson records (Repo.get_groups_lesson_records):
+    python -m benchmarks.group_timetable
+Uses in-memory sqlite, so only the relative numbers are meaningful.
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from datetime import time as day_time
+from typing import Callable, List
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.misc.timetable import encode_weeks
+from db.models import DAYS, Base, Faculty, Group, Lesson, Teacher
+from db.repo import (
+    GROUP_LESSONS_ORDER,
+    LessonRecord,
+    group_weeks,
+    lesson_records_query,
+)
+
+SIZES = (50, 500, 5_000)
+REPEAT = 20
+GROUP_ID = 1
+TEACHERS = 50
+
+
+def fill(session: Session, lessons: int) -> None:
+    """Add a group with the given number of lessons."""
+    added_at = datetime.now(timezone.utc)
+    session.execute(insert(Faculty), [{"id": 1, "name": "Faculty"}])
+    session.execute(insert(Group), [{"id": GROUP_ID, "name": "Group", "faculty_id": 1}])
+    session.execute(
+        insert(Teacher),
+        [{"id": i, "name": f"Teacher {i}"} for i in range(1, TEACHERS + 1)],
+    )
+    session.execute(
+        insert(Lesson),
+        [
+            {
+                "id": i + 1,
+                "group_id": GROUP_ID,
+                "num": num,
+                "auditory": f"{random.randint(1, 9)}{random.randint(10, 40)}",
+                "type": random.choice(("Лк", "Лб", "Пр")),
+                "subgroup": random.randint(0, 2),
+                "name": f"Subject {random.randint(1, 30)}",
+                "teacher_id": random.randint(1, TEACHERS),
+                "begin": day_time(8 + num, 30),
+                "end": day_time(9 + num, 50),
+                "dow": random.randrange(len(DAYS)),
+                "week_num": random.randint(1, 2),
+                "added_at": added_at,
+            }
+            for i, num in enumerate(random.choices(range(1, 9), k=lessons))
+        ],
+    )
+    session.commit()
+
+
+def orm_path(session: Session) -> bytes:
+    """Build timetable like Repo.get_group_lessons + encode_lessons."""
+    lessons = session.scalars(
+        select(Lesson)
+        .options(joinedload(Lesson.teacher))
+        .where(Lesson.group_id == GROUP_ID)
+        .order_by(*GROUP_LESSONS_ORDER)
+    ).all()
+    return encode_weeks(group_weeks(lessons))
+
+
+def records_path(session: Session) -> bytes:
+    """Build timetable like Repo.get_groups_lesson_records + encode_weeks."""
+    records: List[LessonRecord] = [
+        LessonRecord(row)
+        for row in session.execute(lesson_records_query([GROUP_ID])).tuples()
+    ]
+    return encode_weeks(group_weeks(records))
+
+
+def measure(session: Session, build: Callable[[Session], bytes]) -> float:
+    """Best time of REPEAT builds, in milliseconds (identity map is reset)."""
+    best = float("inf")
+    for _ in range(REPEAT):
+        session.expunge_all()
+        start = time.perf_counter()
+        build(session)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    """Benchmark entry point."""
+    print(f"{'lessons':>8} {'to_dict, ms':>12} {'records, ms':>12} {'speedup':>8}")
+    for size in SIZES:
+        engine = create_engine("sqlite://")
+        # Only the tables the builds read
+        tables = [Faculty.__table__, Group.__table__, Teacher.__table__]
+        Base.metadata.create_all(engine, tables=[*tables, Lesson.__table__])
+        with Session(engine) as session:
+            fill(session, size)
+            assert orm_path(session) == records_path(session)
+            orm_ms = measure(session, orm_path)
+            records_ms = measure(session, records_path)
+        engine.dispose()
+        print(
+            f"{size:>8} {orm_ms:>12.2f} {records_ms:>12.2f} {orm_ms / records_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare groups lessons sync time (app.ingest.sync_groups_lessons) at different
+concurrency against a local fake JetIQ server, which answers after LATENCY:
+    python -m benchmarks.groups_sync
+The JetIQ fetchers (app.utils) are replaced with a stub that gets the group
+schedule from the fake server and doesn't write it, so the numbers show only
+how the sync overlaps JetIQ round trips. Concurrency 1 is the old sequential sync.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+from fakeredis.aioredis import FakeRedis
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import ingest
+from app.exceptions.jet_status_exception import JetIQStatusCodeError
+from db.db import sa_sessionmaker
+from db.repo import Repo
+
+GROUPS = 100
+LESSONS = 40
+LATENCY = 0.05
+CONCURRENCY = (1, 8, 32)
+HOST, PORT = "127.0.0.1", 8089
+
+
+async def schedule(request: web.Request) -> web.Response:
+    """Fake JetIQ group schedule."""
+    await asyncio.sleep(LATENCY)
+    group_id = int(request.query["group_id"])
+    lessons: List[Dict[str, Any]] = [
+        {"group_id": group_id, "num": i % 5 + 1, "name": f"Lesson {i}"}
+        for i in range(LESSONS)
+    ]
+    return web.json_response(lessons)
+
+
+async def fetch_groups_lessons(repo: Repo, redis: Any, groups_ids: List[int]) -> None:
+    """Stub of app.utils.update_groups_lessons: only gets the schedules."""
+    del repo, redis
+    async with ClientSession() as session:
+        for group_id in groups_ids:
+            async with session.get(
+                f"http://{HOST}:{PORT}/", params={"group_id": group_id}
+            ) as response:
+                if response.status != 200:
+                    raise JetIQStatusCodeError(f"Status code {response.status}")
+                await response.json()
+
+
+async def main() -> None:
+    """Benchmark entry point."""
+    app = web.Application()
+    app.router.add_get("/", schedule)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    # Sessions are opened by the sync, but not used by the stub
+    engine = create_async_engine("sqlite+aiosqlite://")
+    session_factory = sa_sessionmaker(engine)
+    ingest.update_groups_lessons = fetch_groups_lessons
+    print(f"{GROUPS} groups, JetIQ latency {LATENCY * 1000:.0f} ms")
+    print(f"{'concurrency':>11} {'seconds':>8} {'speedup':>8}")
+    sequential: float | None = None
+    try:
+        for concurrency in CONCURRENCY:
+            start = time.perf_counter()
+            await ingest.sync_groups_lessons(
+                session_factory=session_factory,
+                redis=FakeRedis(),
+                groups_ids=range(GROUPS),
+                concurrency=concurrency,
+            )
+            seconds = time.perf_counter() - start
+            sequential = sequential or seconds
+            print(f"{concurrency:>11} {seconds:>8.2f} {sequential / seconds:>7.1f}x")
+    finally:
+        await engine.dispose()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
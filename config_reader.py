@@ -1,3 +1,4 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +8,19 @@ class Postgres(BaseSettings):
     db: str
     user: str
     password: str
+    # Engine pool settings (one engine per process, so a process opens
+    # at most pool + overflow connections). Names are single words because of
+    # the "_" nested delimiter (POSTGRES_POOL, POSTGRES_OVERFLOW, ...).
+    pool: int = 10
+    overflow: int = 10
+    # Seconds to wait for a free connection
+    timeout: float = 30
+    # Seconds after which connection is reopened
+    recycle: int = 1800
+    # Whether to check connection liveness on checkout
+    preping: bool = True
+    # Size of asyncpg prepared statements cache per connection (0 for pgbouncer)
+    statements: int = 100
 
     def make_connection_string(self) -> str:
         """Function to make a connection string to postgres database."""
@@ -21,6 +35,13 @@ class Redis(BaseSettings):
     host: str
     port: int
     db: int
+    # Connection pool settings. Names are single words because of
+    # the "_" nested delimiter (REDIS_CONNECTIONS, REDIS_TIMEOUT, ...).
+    connections: int = 50
+    timeout: float = 5.0
+    # Seconds to wait for a free connection when all of them are in use
+    wait: float = 10.0
+    healthcheck: int = 30
 
     def make_connection_string(self) -> str:
         """Function to make a connection string to redis."""
@@ -28,9 +49,40 @@ class Redis(BaseSettings):
         return result
 
 
+class Cache(BaseModel):
+    # Per-worker in-memory cache in front of redis
+    size: int = 4096
+    ttl: int = 300
+    # Seconds for which stale entry is served while it's rebuilt
+    grace: int = 600
+    # Timeout of the redis lock held by a worker rebuilding an entry
+    lock: int = 30
+    # Whether to fill cache with all timetables after lessons sync
+    warmup: bool = True
+    # Seconds for which clients and proxies can reuse responses (Cache-Control)
+    maxage: int = 300
+
+
+class JetIQ(BaseModel):
+    # Max number of concurrent requests (and groups synced at once)
+    concurrency: int = 8
+    # Max number of tries (with exponential backoff) to sync a group
+    tries: int = 3
+
+
+class Scheduler(BaseModel):
+    # Whether this process takes part in the leader election for scheduled tasks
+    enabled: bool = True
+    # Leader lease duration in seconds (failover time)
+    lease: int = 30
+
+
 class Config(BaseSettings):
     postgres: Postgres
     redis: Redis
+    cache: Cache = Cache()
+    jetiq: JetIQ = JetIQ()
+    scheduler: Scheduler = Scheduler()
 
     class Config:
         env_file = ".env"
@@ -1,26 +1,59 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import time
+from typing import Any
+
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+    async_sessionmaker,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config_reader import Postgres
 
 
-def create_engine(connection_string: str, echo: bool = False):
-    """Function to create engine from connection string."""
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool which keeps statistics of connections checkout wait time."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+def create_engine(db: Postgres, echo: bool = False) -> AsyncEngine:
+    """
+    Function to create engine. It's created once per process and shared
+    by all its sessions, so pool settings bound connections of the process.
+    """
     engine = create_async_engine(
-        connection_string,
+        db.make_connection_string(),
         query_cache_size=1200,
-        pool_size=20,
-        max_overflow=200,
-        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=db.pool,
+        max_overflow=db.overflow,
+        pool_timeout=db.timeout,
+        pool_recycle=db.recycle,
+        pool_pre_ping=db.preping,
+        connect_args={"prepared_statement_cache_size": db.statements},
         echo=echo,
     )
     return engine
 
 
-def sa_sessionmaker(
-    db: Postgres, echo: bool = False
-) -> async_sessionmaker[AsyncSession]:
+def sa_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
     """Function to create sa session pool."""
-    engine = create_engine(db.make_connection_string(), echo=echo)
     session_pool = async_sessionmaker(
         bind=engine, expire_on_commit=False, autoflush=False, class_=AsyncSession
     )
@@ -1,9 +1,96 @@
-import uuid
-from datetime import datetime
-from typing import List
-
-from sqlalchemy import DateTime, ForeignKey, UUID, func
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from datetime import datetime, time
+from functools import lru_cache
+from typing import Any, List
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    JSON,
+    SmallInteger,
+    Time,
+    func,
+)
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    mapped_column,
+    relationship,
+    validates,
+)
+from sqlalchemy.types import TypeDecorator
+
+DAYS: tuple[str, ...] = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Нд")
+
+
+def day_number(value: Any) -> int | None:
+    """Day of the week number (0 is Monday). Accepts day names too."""
+    if isinstance(value, str):
+        return DAYS.index(value)
+    return value
+
+
+def time_of_day(value: Any) -> time | None:
+    """Time of day. Accepts datetime too (only its time is kept)."""
+    if isinstance(value, datetime):
+        return value.time()
+    return value
+
+
+@lru_cache(maxsize=256)
+def _format_time(value: time) -> str:
+    return value.strftime("%H:%M")
+
+
+@lru_cache(maxsize=256)
+def _format_added_at(value: datetime) -> str:
+    return value.strftime("%d/%m/%Y, %H:%M:%S")
+
+
+def lesson_dict(lesson: Any, teacher_id: int, teacher_name: str) -> dict:
+    """
+    Format lesson to dictionary. Time strings are formatted once
+    per distinct value (lessons share few of them).
+    :param lesson: Lesson or a row with the same attributes (see LessonRecord)
+    :param teacher_id: id of the lesson teacher
+    :param teacher_name: name of the lesson teacher
+    :return: lesson dictionary
+    """
+    return {
+        "num": lesson.num,
+        "auditory": lesson.auditory,
+        "type": lesson.type,
+        "subgroup": lesson.subgroup,
+        "name": lesson.name,
+        "teacher": {"id": teacher_id, "name": teacher_name},
+        "begin": _format_time(lesson.begin),
+        "end": _format_time(lesson.end),
+        "added_at": _format_added_at(lesson.added_at),
+    }
+
+
+# Only bind conversion is needed, other TypeDecorator hooks are optional
+class DayOfWeek(TypeDecorator):  # pylint: disable=too-many-ancestors,abstract-method
+    """Day of the week stored as smallint (0 is Monday). Accepts day names too."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> int | None:
+        return day_number(value)
+
+
+class TimeOfDay(TypeDecorator):  # pylint: disable=too-many-ancestors,abstract-method
+    """Time column. Accepts datetime too (only its time is stored)."""
+
+    impl = Time
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> time | None:
+        return time_of_day(value)
 
 
 class Base(DeclarativeBase):
@@ -14,44 +101,46 @@ class Lesson(Base):
     """Lesson model."""
 
     __tablename__ = "lessons"
-    id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    __table_args__ = (
+        # Group timetable lookups (and their ordering)
+        Index("ix_lessons_group_week_dow_num", "group_id", "week_num", "dow", "num"),
+    )
+    # sqlite autoincrements only integer primary keys (tests)
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), Identity(), primary_key=True
     )
     group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"))
     group: Mapped["Group"] = relationship(back_populates="lessons")
     num: Mapped[int] = mapped_column()
-    auditory: Mapped[str] = mapped_column()
+    auditory: Mapped[str] = mapped_column(index=True)
     type: Mapped[str] = mapped_column()
     subgroup: Mapped[int] = mapped_column()
     name: Mapped[str] = mapped_column()
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
     teacher: Mapped["Teacher"] = relationship(back_populates="lessons")
-    begin: Mapped[datetime] = mapped_column(DateTime)
-    end: Mapped[datetime] = mapped_column(DateTime)
-    dow: Mapped[str] = mapped_column()
+    begin: Mapped[time] = mapped_column(TimeOfDay)
+    end: Mapped[time] = mapped_column(TimeOfDay)
+    dow: Mapped[int] = mapped_column(DayOfWeek)
     week_num: Mapped[int] = mapped_column()
     added_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=func.now()  # pylint: disable=not-callable
     )
 
+    # Column types convert values only when they are written, so lessons built
+    # with day names or datetimes are normalized right away (e.g. for group_weeks)
+    @validates("dow")
+    def validate_dow(self, _key: str, value: Any) -> int | None:
+        """Store day name as its number."""
+        return day_number(value)
+
+    @validates("begin", "end")
+    def validate_time(self, _key: str, value: Any) -> time | None:
+        """Store datetime as its time."""
+        return time_of_day(value)
+
     def to_dict(self) -> dict:
         """Formatting lesson object to dictionary."""
-        formatted_lesson: dict = {
-            "num": self.num,
-            "auditory": self.auditory,
-            "type": self.type,
-            "subgroup": self.subgroup,
-            "name": self.name,
-            "teacher": {
-                "id": self.teacher.id,
-                "name": self.teacher.name,
-            },
-            "begin": self.begin.strftime("%H:%M"),
-            "end": self.end.strftime("%H:%M"),
-            "added_at": self.added_at.strftime("%d/%m/%Y, %H:%M:%S"),
-        }
-
-        return formatted_lesson
+        return lesson_dict(self, self.teacher.id, self.teacher.name)
 
 
 class Teacher(Base):
@@ -73,13 +162,31 @@ class Group(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column()
     lessons: Mapped[List["Lesson"]] = relationship(back_populates="group")
-    faculty_id: Mapped[int] = mapped_column(ForeignKey("faculties.id"))
+    faculty_id: Mapped[int] = mapped_column(ForeignKey("faculties.id"), index=True)
     faculty: Mapped["Faculty"] = relationship(back_populates="groups")
+    # Hash of the group lessons set, to skip unchanged groups on sync
+    lessons_hash: Mapped[str | None] = mapped_column()
     added_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=func.now()  # pylint: disable=not-callable
     )
 
 
+class GroupTimetable(Base):
+    """
+    Snapshot of the group week-agnostic timetable: lessons of every day
+    of the first and the second week. Rebuilt together with the group lessons.
+    """
+
+    __tablename__ = "group_timetables"
+    group_id: Mapped[int] = mapped_column(ForeignKey("groups.id"), primary_key=True)
+    # json, not jsonb: jsonb reorders keys of lessons, so the served body (and its
+    # ETag) would depend on whether it was built from the snapshot or from lessons
+    timetable: Mapped[List[List[List[dict]]]] = mapped_column(JSON)
+    # Hash of the lessons set the snapshot is built from (see lessons_hash)
+    hash: Mapped[str] = mapped_column()
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
 class Faculty(Base):
     """Faculty model."""
 
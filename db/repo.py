@@ -1,13 +1,51 @@
-from typing import Sequence
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Select, delete, insert, select, update
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import Lesson, Group, Faculty, Teacher
+from db.models import (
+    DAYS,
+    Lesson,
+    Group,
+    GroupTimetable,
+    Faculty,
+    Teacher,
+    day_number,
+    lesson_dict,
+    time_of_day,
+)
 
+# Columns of a lesson row accepted by bulk write methods
+LESSON_COLUMNS: Tuple[str, ...] = (
+    "group_id",
+    "num",
+    "auditory",
+    "type",
+    "subgroup",
+    "name",
+    "teacher_id",
+    "begin",
+    "end",
+    "dow",
+    "week_num",
+)
+# Total order of lessons of groups. Every query building group timetables uses it,
+# so the same lessons are always serialized to the same bytes (and ETag).
+GROUP_LESSONS_ORDER = (
+    Lesson.group_id,
+    Lesson.week_num,
+    Lesson.dow,
+    Lesson.num,
+    Lesson.subgroup,
+    Lesson.id,
+)
 
-class Repo:  # pylint: disable=invalid-name
+
+# Repo is the single data access point, so its methods are all public
+class Repo:  # pylint: disable=invalid-name,too-many-public-methods
     """Database repo"""
 
     def __init__(self, session: AsyncSession) -> None:
@@ -19,20 +57,174 @@ class Repo:  # pylint: disable=invalid-name
             await self.session.scalar(select(Group).where(Group.id == group_id))
         )
 
+    async def get_groups_ids(self) -> Sequence[int]:
+        """Get sorted ids of all groups."""
+        return (await self.session.scalars(select(Group.id).order_by(Group.id))).all()
+
     async def get_group_lessons(self, group_id: int) -> Sequence[Lesson]:
-        """Get the group's lessons."""
+        """Get the group's lessons, ordered by time."""
         return (
             await self.session.scalars(
                 select(Lesson)
                 .options(joinedload(Lesson.teacher))
                 .where(Lesson.group_id == group_id)
+                .order_by(*GROUP_LESSONS_ORDER)
+            )
+        ).all()
+
+    async def get_groups_lessons(self, groups_ids: Iterable[int]) -> Sequence[Lesson]:
+        """Get lessons of groups (in one query), ordered by group and time."""
+        return (
+            await self.session.scalars(
+                select(Lesson)
+                .options(joinedload(Lesson.teacher))
+                .where(Lesson.group_id.in_(list(groups_ids)))
+                .order_by(*GROUP_LESSONS_ORDER)
             )
         ).all()
 
+    async def get_groups_lesson_records(
+        self, groups_ids: Iterable[int]
+    ) -> Dict[int, List["LessonRecord"]]:
+        """
+        Get lessons of groups as lightweight records (see LessonRecord),
+        selected as plain rows, without ORM objects.
+        :param groups_ids: ids of groups
+        :return: {group_id: records ordered by time} (for every requested group)
+        """
+        records: Dict[int, List[LessonRecord]] = {
+            group_id: [] for group_id in groups_ids
+        }
+        result = await self.session.execute(lesson_records_query(list(records)))
+        for row in result.tuples():
+            records[row[0]].append(LessonRecord(row))
+        return records
+
+    async def get_group_timetable(self, group_id: int) -> List[List[List[dict]]] | None:
+        """
+        Get snapshot of the group timetable (see group_weeks).
+        It's returned only if it was built from the lessons the group hash
+        was saved for (see refresh_groups_cache), otherwise it may be stale.
+        """
+        return await self.session.scalar(
+            select(GroupTimetable.timetable)
+            .join(Group, Group.id == GroupTimetable.group_id)
+            .where(
+                GroupTimetable.group_id == group_id,
+                GroupTimetable.hash == Group.lessons_hash,
+            )
+        )
+
+    async def save_group_timetables(
+        self,
+        lessons: Dict[int, Sequence[Lesson]] | Dict[int, List["LessonRecord"]],
+        commit: bool = True,
+    ) -> None:
+        """
+        Replace timetable snapshots of groups.
+        :param lessons: {group_id: lessons (with loaded teachers) or lesson records}
+        :param commit: whether to commit (False to make it a part of the lessons write)
+        """
+        if not lessons:
+            return
+        updated_at = datetime.now(timezone.utc)
+        await self.session.execute(
+            delete(GroupTimetable).where(GroupTimetable.group_id.in_(list(lessons)))
+        )
+        await self.session.execute(
+            insert(GroupTimetable),
+            [
+                {
+                    "group_id": group_id,
+                    "timetable": group_weeks(group_lessons),
+                    "hash": lessons_hash(map(lesson_row, group_lessons)),
+                    "updated_at": updated_at,
+                }
+                for group_id, group_lessons in lessons.items()
+            ],
+        )
+        if commit:
+            await self.session.commit()
+
+    async def _rebuild_group_timetables(self, groups_ids: Iterable[int]) -> None:
+        """Rebuild timetable snapshots of groups from their lessons (no commit)."""
+        await self.save_group_timetables(
+            await self.get_groups_lesson_records(groups_ids), commit=False
+        )
+
+    async def get_all_lessons(self) -> Sequence[Lesson]:
+        """Get lessons of all groups, ordered by group and time."""
+        return (
+            await self.session.scalars(
+                select(Lesson)
+                .options(joinedload(Lesson.teacher))
+                .order_by(*GROUP_LESSONS_ORDER)
+            )
+        ).all()
+
+    async def get_teachers_lessons(
+        self, teachers_ids: Iterable[int]
+    ) -> Sequence[Lesson]:
+        """Get lessons of teachers (with their groups), ordered by teacher and time."""
+        return (
+            await self.session.scalars(
+                select(Lesson)
+                .options(joinedload(Lesson.teacher), joinedload(Lesson.group))
+                .where(Lesson.teacher_id.in_(list(teachers_ids)))
+                .order_by(
+                    Lesson.teacher_id,
+                    Lesson.week_num,
+                    Lesson.dow,
+                    Lesson.num,
+                    Lesson.group_id,
+                    Lesson.subgroup,
+                    Lesson.id,
+                )
+            )
+        ).all()
+
+    async def get_rooms_lessons(
+        self, rooms: Iterable[str] | None = None
+    ) -> Sequence[Lesson]:
+        """
+        Get lessons held in rooms (with their teachers and groups),
+        ordered by room and time.
+        :param rooms: names of rooms (all rooms by default)
+        """
+        query = (
+            select(Lesson)
+            .options(joinedload(Lesson.teacher), joinedload(Lesson.group))
+            .where(Lesson.auditory != "")
+            .order_by(
+                Lesson.auditory,
+                Lesson.week_num,
+                Lesson.dow,
+                Lesson.num,
+                Lesson.group_id,
+                Lesson.subgroup,
+                Lesson.id,
+            )
+        )
+        if rooms is not None:
+            query = query.where(Lesson.auditory.in_(list(rooms)))
+        return (await self.session.scalars(query)).all()
+
     async def get_faculties(self) -> Sequence[Faculty]:
         """Get list of faculties."""
         return (await self.session.scalars(select(Faculty))).all()
 
+    async def get_faculties_with_groups(self) -> Sequence[Faculty]:
+        """Get list of faculties with their groups loaded (in one query)."""
+        return (
+            (
+                await self.session.scalars(
+                    select(Faculty).options(joinedload(Faculty.groups))
+                )
+            )
+            .unique()
+            .all()
+        )
+
     async def get_faculty(self, faculty_id: int) -> Faculty | None:
         """Get specific faculty."""
         return (
@@ -70,3 +262,171 @@ class Repo:  # pylint: disable=invalid-name
                 select(Teacher).where(Teacher.name == teacher_name)
             )
         ).scalar()
+
+    async def get_groups_hashes(self) -> Dict[int, str | None]:
+        """Get lessons hashes of all groups."""
+        return dict(
+            (await self.session.execute(select(Group.id, Group.lessons_hash)))
+            .tuples()
+            .all()
+        )
+
+    async def set_groups_hashes(self, hashes: Dict[int, str]) -> None:
+        """Set lessons hashes of groups."""
+        if hashes:
+            await self.session.execute(
+                update(Group),
+                [
+                    {"id": group_id, "lessons_hash": lessons_hash}
+                    for group_id, lessons_hash in hashes.items()
+                ],
+            )
+            await self.session.commit()
+
+    async def replace_group_lessons(
+        self, group_id: int, rows: Sequence[Dict[str, Any]]
+    ) -> bool:
+        """
+        Replace all lessons of the group in one transaction (multi-row insert).
+        Timetable snapshot is rebuilt in the same transaction.
+        Nothing is written if lessons hash matches the stored one. The hash itself
+        is updated after sync, together with cache (see refresh_groups_cache).
+        :param group_id: id of the group
+        :param rows: lessons as dicts with LESSON_COLUMNS keys (group_id is optional)
+        :return: whether lessons were changed
+        """
+        stored_hash: str | None = await self.session.scalar(
+            select(Group.lessons_hash).where(Group.id == group_id)
+        )
+        if stored_hash is not None and stored_hash == lessons_hash(rows):
+            return False
+        await self.session.execute(delete(Lesson).where(Lesson.group_id == group_id))
+        if rows:
+            await self.session.execute(
+                insert(Lesson), [{**row, "group_id": group_id} for row in rows]
+            )
+        await self._rebuild_group_timetables([group_id])
+        await self.session.commit()
+        return True
+
+    async def replace_all_lessons(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace lessons of all groups in one transaction.
+        Rows are streamed to the table with COPY, bypassing the ORM.
+        Timetable snapshots are rebuilt in the same transaction.
+        :param rows: lessons as dicts with LESSON_COLUMNS keys
+        """
+        await self.session.execute(delete(Lesson))
+        connection = await (await self.session.connection()).get_raw_connection()
+        added_at = datetime.now(timezone.utc)
+        await connection.driver_connection.copy_records_to_table(
+            Lesson.__tablename__,
+            records=(_lesson_record(row, added_at) for row in rows),
+            columns=[*LESSON_COLUMNS, "added_at"],
+        )
+        await self._rebuild_group_timetables(await self.get_groups_ids())
+        await self.session.commit()
+
+
+# group_id is the same for all lessons of the group, so it's not hashed
+_HASHED_COLUMNS: Tuple[str, ...] = LESSON_COLUMNS[1:]
+
+
+def _lesson_values(
+    row: Dict[str, Any], columns: Tuple[str, ...] = LESSON_COLUMNS
+) -> Tuple[Any, ...]:
+    """Get lesson row values (types are converted like ORM does)."""
+    converted: Dict[str, Any] = {
+        **row,
+        "dow": day_number(row["dow"]),
+        "begin": time_of_day(row["begin"]),
+        "end": time_of_day(row["end"]),
+    }
+    return tuple(converted[column] for column in columns)
+
+
+def _lesson_record(row: Dict[str, Any], added_at: datetime) -> Tuple[Any, ...]:
+    """Convert lesson row to COPY record."""
+    return (*_lesson_values(row), added_at)
+
+
+# Attributes are the columns of the row
+class LessonRecord:  # pylint: disable=too-many-instance-attributes
+    """
+    Lesson read as a plain row, with its teacher name (see lesson_records_query).
+    Has the same to_dict as Lesson, but without ORM bookkeeping.
+    """
+
+    __slots__ = (*LESSON_COLUMNS, "teacher_name", "added_at")
+
+    def __init__(self, row: Sequence[Any]) -> None:
+        (
+            self.group_id,
+            self.num,
+            self.auditory,
+            self.type,
+            self.subgroup,
+            self.name,
+            self.teacher_id,
+            self.begin,
+            self.end,
+            self.dow,
+            self.week_num,
+            self.teacher_name,
+            self.added_at,
+        ) = row
+
+    def to_dict(self) -> dict:
+        """Same dict as Lesson.to_dict."""
+        return lesson_dict(self, self.teacher_id, self.teacher_name)
+
+
+def lesson_records_query(groups_ids: List[int]) -> Select:
+    """
+    Query of LessonRecord rows of groups, ordered by group and time.
+    :param groups_ids: ids of groups
+    """
+    return (
+        select(
+            *(getattr(Lesson, column) for column in LESSON_COLUMNS),
+            Teacher.name,
+            Lesson.added_at,
+        )
+        .join(Lesson.teacher)
+        .where(Lesson.group_id.in_(groups_ids))
+        .order_by(*GROUP_LESSONS_ORDER)
+    )
+
+
+def group_weeks(
+    lessons: Iterable[Lesson] | Iterable[LessonRecord],
+) -> List[List[List[dict]]]:
+    """
+    Week-agnostic timetable of the group.
+    :param lessons: lessons of the group (with loaded teachers) or lesson records,
+    ordered by time
+    :return: lessons of every day of the first and the second week
+    """
+    weeks: List[List[List[dict]]] = [[[] for _ in DAYS] for _ in range(2)]
+    for lesson in lessons:
+        weeks[0 if lesson.week_num == 1 else 1][lesson.dow].append(lesson.to_dict())
+    return weeks
+
+
+def lesson_row(lesson: Lesson | LessonRecord) -> Dict[str, Any]:
+    """Convert lesson (or lesson record) to row with LESSON_COLUMNS keys."""
+    return {column: getattr(lesson, column) for column in LESSON_COLUMNS}
+
+
+def lessons_hash(rows: Iterable[Dict[str, Any]]) -> str:
+    """
+    Stable hash of the group lessons set. Doesn't depend on rows order
+    and on the form of day (name or number) and time (datetime or time).
+    :param rows: lessons as dicts with LESSON_COLUMNS keys
+    :return: hex digest
+    """
+    normalized = sorted(
+        "\t".join(str(value) for value in _lesson_values(row, _HASHED_COLUMNS))
+        for row in rows
+    )
+    return hashlib.sha256("\n".join(normalized).encode()).hexdigest()
@@ -1,132 +1,69 @@
+import asyncio
 import logging
-from datetime import datetime
 from contextlib import asynccontextmanager
 
-from apscheduler.job import Job  # type: ignore
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 
-from redis.asyncio import Redis
-from redis import asyncio as aioredis
+from redis.asyncio import ConnectionPool, Redis
 
+from app.cache import configure_cache, listen_invalidations
+from app.leader import LeaderLease
 from app.logging_cfg import InterceptHandler
+from app.misc.group_index import group_index
+from app.misc.room_index import room_index
+from app.redis_session import create_redis_pool
 from app.routes.groups import group_router
 from app.routes.faculties import faculty_router
+from app.routes.jobs import jobs_router
+from app.routes.rooms import rooms_router
+from app.routes.stats import stats_router
 from app.routes.teachers import teachers_router
-from app.scheduled_tasks import (
-    update_faculties_table,
-    update_groups_table,
-    update_groups_lessons_table,
-)
+from app.scheduler import run_scheduler
 from config_reader import Config, load_config
-from db.db import sa_sessionmaker
+from db.db import create_engine, sa_sessionmaker
 
 
 @asynccontextmanager
-async def lifespan(_: FastAPI):
+async def lifespan(application: FastAPI):
     """Lifespan of FastAPI application"""
     logging.info("App started!")
 
     config: Config = load_config()
-    session_maker = sa_sessionmaker(config.postgres)
-    redis: Redis = aioredis.from_url(config.redis.make_connection_string())
-
-    scheduler = AsyncIOScheduler(timezone="Europe/Kyiv")
-    scheduler.start()
-
-    retry_faculties: Job = scheduler.add_job(
-        update_faculties_table,
-        trigger="interval",
-        minutes=10,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": None,
-        },
-    )
-    retry_faculties.kwargs["retry_task"] = retry_faculties
-    retry_faculties.pause()
-
-    retry_groups: Job = scheduler.add_job(
-        update_groups_table,
-        trigger="interval",
-        minutes=10,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": None,
-        },
-    )
-    retry_faculties.kwargs["retry_task"] = retry_groups
-    retry_groups.pause()
-
-    # retry_teachers: Job = ...
-    # retry_teachers.kwargs["retry_task"] = retry_teachers
-    # retry_teachers.pause()
-
-    retry_groups_lessons: Job = scheduler.add_job(
-        update_groups_lessons_table,
-        trigger="interval",
-        minutes=10,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": None,
-        },
-    )
-    retry_groups_lessons.kwargs["retry_task"] = retry_groups_lessons
-    retry_groups_lessons.pause()
-
-    # Main tasks
-
-    scheduler.add_job(
-        update_faculties_table,
-        trigger="cron",
-        day=1,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": retry_faculties,
-        },
-    )
-    scheduler.add_job(
-        update_groups_table,
-        trigger="cron",
-        day=1,
-        hour=1,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": retry_groups,
-        },
-    )
-    # Because by updating groups lessons table we also update teachers table
-    # so, we don't really need this scheduled job
-    # scheduler.add_job(
-    #     update_teachers_table, trigger='cron', hour=3, minute=0, start_date=datetime.now(),
-    #     kwargs={"session_factory": sa_sessionmaker(config.postgres),
-    #     "retry_task": retry_teachers},
-    # )
-    scheduler.add_job(
-        update_groups_lessons_table,
-        trigger="cron",
-        hour=7,
-        start_date=datetime.now(),
-        kwargs={
-            "session_factory": session_maker,
-            "redis": redis,
-            "retry_task": retry_groups_lessons,
-        },
+    engine = create_engine(config.postgres)
+    session_maker = sa_sessionmaker(engine)
+    application.state.engine = engine
+    application.state.session_factory = session_maker
+    redis_pool: ConnectionPool = create_redis_pool(config.redis)
+    redis: Redis = Redis(connection_pool=redis_pool)
+    application.state.redis_pool = redis_pool
+    application.state.redis = redis
+
+    group_index_listener = asyncio.create_task(
+        group_index.listen(session_factory=session_maker, redis=redis)
     )
+    room_index_listener = asyncio.create_task(room_index.listen(redis=redis))
+    configure_cache(config.cache)
+    invalidation_listener = asyncio.create_task(listen_invalidations(redis=redis))
+
+    scheduler_task: asyncio.Task | None = None
+    if config.scheduler.enabled:
+        lease = LeaderLease(redis=redis, lease=config.scheduler.lease)
+        scheduler_task = asyncio.create_task(
+            run_scheduler(session_factory=session_maker, redis=redis, lease=lease)
+        )
+
     yield
-    scheduler.shutdown()
+    if scheduler_task is not None:
+        scheduler_task.cancel()
+        await asyncio.gather(scheduler_task, return_exceptions=True)
+    group_index_listener.cancel()
+    room_index_listener.cancel()
+    invalidation_listener.cancel()
+    await redis.aclose()
+    await redis_pool.disconnect()
+    await engine.dispose()
     logging.info("App stopped!")
 
 
@@ -134,6 +71,9 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(router=group_router)
 app.include_router(router=faculty_router)
 app.include_router(router=teachers_router)
+app.include_router(router=stats_router)
+app.include_router(router=jobs_router)
+app.include_router(router=rooms_router)
 # For handling errors
 logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
 
@@ -0,0 +1,88 @@
+import unittest
+from typing import Any, Iterable, List
+from unittest import mock
+
+from fakeredis.aioredis import FakeRedis
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config_reader import JetIQ as JetIQConfig
+from db.db import sa_sessionmaker
+from db.models import Base, Faculty, Group
+
+try:
+    from app import ingest
+    from app.exceptions.jet_status_exception import JetIQStatusCodeError
+except ImportError:  # JetIQ fetchers (app.utils) are private
+    ingest = None  # type: ignore[assignment]
+
+FAILING_GROUP = 2
+
+
+@unittest.skipIf(ingest is None, "app.utils is not available")
+class PartialSyncTest(unittest.IsolatedAsyncioTestCase):
+    """Cache of synced groups is refreshed even if other groups fail."""
+
+    async def asyncSetUp(self) -> None:
+        self.engine: AsyncEngine = create_async_engine("sqlite+aiosqlite://")
+        self.addAsyncCleanup(self.engine.dispose)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(
+                Base.metadata.create_all,
+                tables=[Faculty.__table__, Group.__table__],  # type: ignore[list-item]
+            )
+        self.session_factory = sa_sessionmaker(self.engine)
+        async with self.session_factory() as session:
+            session.add(Faculty(id=1, name="Faculty"))
+            session.add_all(
+                [Group(id=i, name=f"Group {i}", faculty_id=1) for i in (1, 2, 3)]
+            )
+            await session.commit()
+        self.redis = FakeRedis()
+        self.addAsyncCleanup(self.redis.aclose)
+        self.synced: List[int] = []
+        self.refresh = mock.AsyncMock()
+        # No retries, so the failing group fails at once
+        patches = [
+            mock.patch.object(ingest, "settings", JetIQConfig(tries=1)),
+            mock.patch.object(ingest, "update_groups_lessons", self._update),
+            mock.patch.object(ingest, "refresh_groups_cache", self.refresh),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.fail_group = True
+
+    async def _update(self, repo: Any, redis: Any, groups_ids: Iterable[int]) -> None:
+        del repo, redis
+        for group_id in groups_ids:
+            if group_id == FAILING_GROUP and self.fail_group:
+                raise JetIQStatusCodeError("Status code 500")
+            self.synced.append(group_id)
+
+    def _refreshed(self) -> List[int]:
+        return sorted(self.refresh.await_args.kwargs["groups_ids"])
+
+    async def test_partial_failure(self) -> None:
+        with self.assertRaises(JetIQStatusCodeError):
+            await ingest.sync_all_groups_lessons(
+                session_factory=self.session_factory, redis=self.redis
+            )
+        self.assertEqual(sorted(self.synced), [1, 3])
+        self.assertEqual(self._refreshed(), [1, 3])
+        progress = ingest.SyncProgress(redis=self.redis)
+        self.assertEqual(await progress.pending(), {FAILING_GROUP})
+        self.assertTrue(await progress.unfinished())
+
+        # Resumed run syncs only the failed group
+        self.fail_group = False
+        self.synced.clear()
+        await ingest.sync_all_groups_lessons(
+            session_factory=self.session_factory, redis=self.redis, resume=True
+        )
+        self.assertEqual(self.synced, [FAILING_GROUP])
+        self.assertEqual(self._refreshed(), [1, 2, 3])
+        self.assertFalse(await progress.unfinished())
+
+
+if __name__ == "__main__":
+    unittest.main()
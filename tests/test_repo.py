@@ -0,0 +1,232 @@
+import unittest
+from datetime import datetime, time
+from itertools import product
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from db.db import sa_sessionmaker
+from db.models import Base, Faculty, Group, GroupTimetable, Lesson, Teacher
+from db.repo import Repo, group_weeks, lessons_hash
+from app.misc.timetable import encode_faculties, encode_weeks
+
+
+class FacultiesQueriesTest(unittest.IsolatedAsyncioTestCase):
+    """Faculties with their groups are loaded with the same number of queries."""
+
+    async def asyncSetUp(self) -> None:
+        self.engine: AsyncEngine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(
+                Base.metadata.create_all,
+                tables=[Faculty.__table__, Group.__table__],  # type: ignore[list-item]
+            )
+        self.statements: List[str] = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._count)
+        self.session_factory = sa_sessionmaker(self.engine)
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    def _count(self, *args: Any) -> None:
+        self.statements.append(args[2])
+
+    async def _add_faculties(self, start: int, count: int) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                insert(Faculty),
+                [
+                    {"id": i, "name": f"Faculty {i}"}
+                    for i in range(start, start + count)
+                ],
+            )
+            await session.execute(
+                insert(Group),
+                [
+                    {"id": i * 100 + j, "name": f"Group {j}", "faculty_id": i}
+                    for i in range(start, start + count)
+                    for j in range(5)
+                ],
+            )
+            await session.commit()
+
+    async def _queries(self) -> int:
+        self.statements.clear()
+        async with self.session_factory() as session:
+            await encode_faculties(repo=Repo(session=session))
+        return len(self.statements)
+
+    async def test_queries_count_is_constant(self) -> None:
+        await self._add_faculties(start=1, count=2)
+        few: int = await self._queries()
+        await self._add_faculties(start=3, count=50)
+        self.assertEqual(await self._queries(), few)
+        self.assertEqual(few, 1)
+
+
+class LessonsOrderTest(unittest.IsolatedAsyncioTestCase):
+    """Every query gives lessons of a group in the same order."""
+
+    async def asyncSetUp(self) -> None:
+        self.engine: AsyncEngine = create_async_engine("sqlite+aiosqlite://")
+        self.addAsyncCleanup(self.engine.dispose)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        self.session_factory = sa_sessionmaker(self.engine)
+        async with self.session_factory() as session:
+            session.add_all(
+                [
+                    Faculty(id=1, name="Faculty"),
+                    Group(id=1, name="Group 1", faculty_id=1),
+                    Group(id=2, name="Group 2", faculty_id=1),
+                    Teacher(id=1, name="Teacher"),
+                ]
+            )
+            await session.flush()
+            # Subgroups of the same lesson, inserted in reverse order
+            await session.execute(
+                insert(Lesson),
+                [
+                    {
+                        "id": 100 - i,
+                        "group_id": group_id,
+                        "num": num,
+                        "auditory": f"{subgroup}/10{num}",
+                        "type": "Лб",
+                        "subgroup": subgroup,
+                        "name": f"Lesson {num}",
+                        "teacher_id": 1,
+                        "begin": time(8 + num),
+                        "end": time(9 + num),
+                        "dow": dow,
+                        "week_num": week_num,
+                        "added_at": datetime(2024, 4, 22),
+                    }
+                    for i, (group_id, week_num, dow, num, subgroup) in enumerate(
+                        product((2, 1), (2, 1), (4, 0), (3, 1), (2, 1))
+                    )
+                ],
+            )
+            await session.commit()
+
+    async def test_timetables_are_the_same(self) -> None:
+        async with self.session_factory() as session:
+            repo = Repo(session=session)
+            all_lessons = [
+                lesson
+                for lesson in await repo.get_all_lessons()
+                if lesson.group_id == 1
+            ]
+            timetables: List[bytes] = [
+                encode_weeks(group_weeks(lessons))
+                for lessons in (
+                    await repo.get_group_lessons(group_id=1),
+                    await repo.get_groups_lessons([1]),
+                    all_lessons,
+                    (await repo.get_groups_lesson_records([1]))[1],
+                )
+            ]
+        self.assertEqual(len(set(timetables)), 1)
+        monday: List[dict] = group_weeks(all_lessons)[0][0]
+        self.assertEqual(
+            [(lesson["num"], lesson["subgroup"]) for lesson in monday],
+            [(1, 1), (1, 2), (3, 1), (3, 2)],
+        )
+
+
+class ReplaceGroupLessonsTest(unittest.IsolatedAsyncioTestCase):
+    """Group lessons are replaced with their snapshot, unless their hash matches."""
+
+    async def asyncSetUp(self) -> None:
+        self.engine: AsyncEngine = create_async_engine("sqlite+aiosqlite://")
+        self.addAsyncCleanup(self.engine.dispose)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        self.session_factory = sa_sessionmaker(self.engine)
+        async with self.session_factory() as session:
+            session.add_all(
+                [
+                    Faculty(id=1, name="Faculty"),
+                    Group(id=1, name="Group", faculty_id=1),
+                    Teacher(id=1, name="Teacher"),
+                ]
+            )
+            await session.commit()
+        # Rows as they come from JetIQ: day names and datetimes
+        self.rows: List[Dict[str, Any]] = [
+            {
+                "num": num,
+                "auditory": f"1/10{num}",
+                "type": "Лк",
+                "subgroup": 0,
+                "name": f"Lesson {num}",
+                "teacher_id": 1,
+                "begin": datetime(2024, 4, 22, 8 + num),
+                "end": datetime(2024, 4, 22, 9 + num),
+                "dow": dow,
+                "week_num": 1,
+            }
+            for dow in ("Вт", "Пн")
+            for num in (2, 1)
+        ]
+
+    async def _replace(self, rows: List[Dict[str, Any]]) -> bool:
+        async with self.session_factory() as session:
+            return await Repo(session=session).replace_group_lessons(1, rows)
+
+    async def _state(self) -> Tuple[List[int], Any, Any, str | None]:
+        """Lessons ids, snapshot, timetable built from the lessons, snapshot hash."""
+        async with self.session_factory() as session:
+            repo = Repo(session=session)
+            lessons = await repo.get_group_lessons(group_id=1)
+            snapshot, snapshot_hash = (
+                await session.execute(
+                    select(GroupTimetable.timetable, GroupTimetable.hash)
+                )
+            ).one()
+        return (
+            [lesson.id for lesson in lessons],
+            snapshot,
+            group_weeks(lessons),
+            snapshot_hash,
+        )
+
+    async def _trusted_snapshot(self) -> Any:
+        async with self.session_factory() as session:
+            return await Repo(session=session).get_group_timetable(group_id=1)
+
+    async def test_replace(self) -> None:
+        self.assertTrue(await self._replace(self.rows))
+        ids, snapshot, built, snapshot_hash = await self._state()
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(snapshot, built)
+        self.assertEqual(snapshot_hash, lessons_hash(self.rows))
+        self.assertEqual([lesson["num"] for lesson in snapshot[0][0]], [1, 2])
+        # Snapshot is used only after the group hash is saved for its lessons
+        self.assertIsNone(await self._trusted_snapshot())
+
+        # Hash is stored after sync: the same lessons (in any order) aren't written
+        async with self.session_factory() as session:
+            await Repo(session=session).set_groups_hashes({1: snapshot_hash})
+        self.assertEqual(await self._trusted_snapshot(), snapshot)
+        self.assertFalse(await self._replace(self.rows[::-1]))
+        self.assertEqual((await self._state())[0], ids)
+
+        changed: List[Dict[str, Any]] = [*self.rows[1:], {**self.rows[0], "num": 5}]
+        self.assertTrue(await self._replace(changed))
+        new_ids, snapshot, built, snapshot_hash = await self._state()
+        self.assertNotEqual(new_ids, ids)
+        self.assertEqual(snapshot, built)
+        self.assertEqual(snapshot_hash, lessons_hash(changed))
+        self.assertIsNone(await self._trusted_snapshot())
+
+        self.assertTrue(await self._replace([]))
+        self.assertEqual(
+            await self._state(),
+            ([], group_weeks([]), group_weeks([]), lessons_hash([])),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()